@@ -0,0 +1,73 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""Measure startup cost of `import shaper` for short-lived CLI invocations.
+
+Runs `python -X importtime -c 'import shaper'` in fresh interpreters and
+reports median cumulative import time of the shaper package (as reported by
+-X importtime) and median wall time of the whole process, which also
+includes work done at import time outside of imports (e.g. subprocesses).
+
+Usage:
+    PYTHONPATH=. python benchmarks/import_time.py [--repeat N] [--statement STMT]
+"""
+
+from __future__ import print_function
+
+import argparse
+import subprocess
+import sys
+import time
+
+
+def import_time(statement, module):
+    """Run statement in fresh interpreter.
+
+    :return: cumulative import time of module in microseconds and wall time in seconds
+    :rtype: tuple
+    """
+
+    started = time.time()
+    output = subprocess.check_output(
+        [sys.executable, '-X', 'importtime', '-c', statement],
+        stderr=subprocess.STDOUT,
+    )
+    wall = time.time() - started
+
+    cumulative = 0
+    for line in output.decode('utf-8').splitlines():
+        if not line.startswith('import time:'):
+            continue
+        _, cumulative_us, name = line[len('import time:'):].split('|')
+        if name.strip() == module:
+            cumulative = int(cumulative_us)
+
+    return cumulative, wall
+
+
+def median(values):
+    values = sorted(values)
+    return values[len(values) // 2]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--repeat', type=int, default=20)
+    parser.add_argument('--statement', default='import shaper')
+    parser.add_argument('--module', default='shaper')
+    arguments = parser.parse_args()
+
+    if sys.version_info < (3, 7):
+        parser.error('-X importtime requires python 3.7+')
+
+    results = [import_time(arguments.statement, arguments.module) for _ in range(arguments.repeat)]
+
+    print('{statement!r}: import {imports:.1f} ms, process wall {wall:.1f} ms (median of {repeat})'.format(
+        statement=arguments.statement,
+        imports=median(cumulative for cumulative, _ in results) / 1000.0,
+        wall=median(wall for _, wall in results) * 1000.0,
+        repeat=arguments.repeat,
+    ))
+
+
+if __name__ == '__main__':
+    main()
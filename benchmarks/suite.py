@@ -0,0 +1,173 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""Benchmark suite: time shaper commands, parsers and dicttoxml at several scales.
+
+Trees are generated by benchmarks/synthetic.py into temp directory. Every
+benchmark is run --repeat times, min and median seconds are stored to JSON
+together with shaper and python versions, so results of two versions can be
+compared with `compare`.
+
+Usage:
+    PYTHONPATH=. python benchmarks/suite.py run [--scales small,medium] [--repeat N] [-o results.json]
+    PYTHONPATH=. python benchmarks/suite.py compare old.json new.json [--threshold 0.1]
+"""
+
+from __future__ import print_function
+
+import argparse
+import json
+import os
+import platform
+import shutil
+import sys
+import tempfile
+import time
+import timeit
+from collections import OrderedDict
+
+from synthetic import FORMATS, Scale, generate_playbook, generate_tree
+
+import shaper
+from shaper import cli, libs, manager
+from shaper.libs import dicttoxml, lxml_backend
+from shaper.libs.parser import PARSERS_MAPPING
+
+SCALES = OrderedDict([
+    ('small', Scale(modules=5, environments=3, files_per_format=1, keys=20)),
+    ('medium', Scale(modules=20, environments=5, files_per_format=2, keys=50)),
+    ('large', Scale(modules=100, environments=10, files_per_format=2, keys=100)),
+])
+
+
+def run_command(argv):
+    parser = cli.construct_parser()
+    cli.run(parser, parser.parse_args(argv))
+
+
+def measure(func, repeat):
+    timings = sorted(timeit.repeat(func, number=1, repeat=repeat))
+    return OrderedDict([
+        ('min', timings[0]),
+        ('median', timings[len(timings) // 2]),
+        ('repeat', repeat),
+    ])
+
+
+def benchmarks(workdir, scale):
+    """Prepare inputs of scale, yield (name, function) of benchmarks."""
+
+    tree = os.path.join(workdir, 'tree')
+    paths = generate_tree(tree, scale)
+    playbook = generate_playbook(workdir, scale)
+    dsl = os.path.join(workdir, 'dsl.yml')
+    out = os.path.join(workdir, 'out')
+    run_command(['read', tree, '-o', dsl])
+
+    yield 'read', lambda: run_command(['read', tree, '-o', dsl])
+    yield 'write', lambda: run_command(['write', dsl, '-o', out])
+    yield 'play', lambda: run_command(['play', playbook, '-o', out, '-j', '1'])
+    yield 'play --write', lambda: run_command(['play', playbook, '-o', out, '-j', '1', '--write'])
+
+    for fmt in FORMATS:
+        fmt_paths = [path for path in paths if path.endswith('.' + fmt)]
+        parser = PARSERS_MAPPING['.' + fmt]()
+        loaded = [parser.read(path) for path in fmt_paths]
+        target = os.path.join(workdir, 'parser-out.' + fmt)
+
+        yield 'parser read .' + fmt, lambda p=parser, f=fmt_paths: [p.read(path) for path in f]
+        yield 'parser write .' + fmt, lambda p=parser, l=loaded, t=target: [p.write(data, t) for data in l]
+
+    data = manager.backward_path_parser(libs.parser.read(dsl))
+    # XML documents need single root element
+    nested = [{'configuration': value} for value in data.values() if isinstance(value, dict)]
+    yield 'dicttoxml', lambda: [
+        dicttoxml.dict_to_xml(value, fold_list=False, item_func=lambda x: x, attr_type=False, root=False)
+        for value in nested
+    ]
+    if lxml_backend.AVAILABLE:
+        yield 'lxml dict_to_xml', lambda: [lxml_backend.dict_to_xml(value) for value in nested]
+
+
+def run(arguments):
+    results = OrderedDict([
+        ('shaper', shaper.get_version()),
+        ('python', platform.python_version()),
+        ('platform', platform.platform()),
+        ('timestamp', time.strftime('%Y-%m-%dT%H:%M:%S')),
+        ('scales', OrderedDict()),
+    ])
+
+    for scale_name in arguments.scales.split(','):
+        scale = SCALES[scale_name]
+        workdir = tempfile.mkdtemp(prefix='shaper-bench-')
+        timings = OrderedDict()
+        try:
+            for name, func in benchmarks(workdir, scale):
+                timings[name] = measure(func, arguments.repeat)
+                print('{scale:<8} {name:<24} {min:9.4f}s'.format(scale=scale_name, name=name, **timings[name]))
+        finally:
+            shutil.rmtree(workdir)
+
+        results['scales'][scale_name] = OrderedDict([('scale', scale.as_dict()), ('timings', timings)])
+
+    with open(arguments.out, 'w') as _fd:
+        json.dump(results, _fd, indent=4)
+    print('Results saved to {}'.format(arguments.out))
+
+
+def compare(arguments):
+    """Print ratio of min timings new/old, fail if some benchmark is slower than threshold."""
+
+    with open(arguments.old) as _fd:
+        old = json.load(_fd)
+    with open(arguments.new) as _fd:
+        new = json.load(_fd)
+
+    regressions = 0
+    print('{} ({}) -> {} ({})'.format(arguments.old, old['shaper'], arguments.new, new['shaper']))
+    for scale_name, scale in new['scales'].items():
+        old_timings = old['scales'].get(scale_name, {}).get('timings', {})
+        for name, timing in scale['timings'].items():
+            if name not in old_timings:
+                continue
+
+            ratio = timing['min'] / old_timings[name]['min']
+            slower = ratio > 1 + arguments.threshold
+            regressions += slower
+            print('{scale:<8} {name:<24} {old:9.4f}s {new:9.4f}s {ratio:6.2f}x{mark}'.format(
+                scale=scale_name,
+                name=name,
+                old=old_timings[name]['min'],
+                new=timing['min'],
+                ratio=ratio,
+                mark='  REGRESSION' if slower else '',
+            ))
+
+    return 1 if regressions else 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    subparsers = parser.add_subparsers(dest='command')
+
+    run_parser = subparsers.add_parser('run', help='Run benchmarks.')
+    run_parser.add_argument('--scales', default='small,medium', help='Comma separated of: ' + ', '.join(SCALES))
+    run_parser.add_argument('--repeat', type=int, default=5)
+    run_parser.add_argument('-o', '--out', default='benchmark-results.json')
+
+    compare_parser = subparsers.add_parser('compare', help='Compare two results files.')
+    compare_parser.add_argument('old')
+    compare_parser.add_argument('new')
+    compare_parser.add_argument('--threshold', type=float, default=0.1, help='Allowed slowdown. Default 0.1.')
+
+    arguments = parser.parse_args()
+    if arguments.command == 'run':
+        run(arguments)
+    elif arguments.command == 'compare':
+        sys.exit(compare(arguments))
+    else:
+        parser.print_help()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,193 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""Generate synthetic configuration repository for benchmarks.
+
+Tree looks like projects shaper is used on: modules with per-environment
+configuration files of every supported format under src/main/resources,
+plus a playbook rendering the same properties from templates. Part of keys
+(--duplication) has the same value in every environment, as shared
+settings do in real repositories. Output is deterministic for a seed.
+
+Usage:
+    PYTHONPATH=. python benchmarks/synthetic.py DIR [--modules N] [--environments N]
+        [--files-per-format N] [--keys N] [--duplication RATIO] [--seed N]
+"""
+
+from __future__ import print_function
+
+import argparse
+import json
+import os
+import random
+from collections import OrderedDict
+
+from shaper import libs, manager
+
+RESOURCES = os.path.join('src', 'main', 'resources')
+FORMATS = ('properties', 'yml', 'json', 'xml', 'txt')
+SECTIONS = ('spring', 'app', 'db', 'cache', 'security', 'metrics', 'mail', 'feature')
+
+
+class Scale(object):  # pylint: disable=too-few-public-methods
+    """Shape of generated tree."""
+
+    def __init__(self, modules=10, environments=3, files_per_format=1, keys=50, duplication=0.7):
+        self.modules = modules
+        self.environments = environments
+        self.files_per_format = files_per_format
+        self.keys = keys
+        self.duplication = duplication
+
+    def as_dict(self):
+        return OrderedDict([
+            ('modules', self.modules),
+            ('environments', self.environments),
+            ('files_per_format', self.files_per_format),
+            ('keys', self.keys),
+            ('duplication', self.duplication),
+        ])
+
+
+def generate_properties(rng, scale):
+    """Properties of one file by environment: shared keys have the same value everywhere.
+
+    :return: list of OrderedDicts, one per environment
+    """
+
+    environments = [OrderedDict() for _ in range(scale.environments)]
+    for number in range(scale.keys):
+        key = '{section}.{name}{number}'.format(
+            section=rng.choice(SECTIONS),
+            name=rng.choice(('host', 'port', 'timeout', 'enabled', 'url', 'name', 'size')),
+            number=number,
+        )
+        shared = rng.random() < scale.duplication
+        value = 'value-{}'.format(rng.randint(0, 10 ** 6))
+        for env, properties in enumerate(environments):
+            properties[key] = value if shared else '{}-env{}'.format(value, env)
+
+    return environments
+
+
+def nest(properties):
+    """Nest dotted keys one level deep, like YAML/JSON configs usually are."""
+
+    nested = OrderedDict()
+    for key, value in properties.items():
+        section, _, name = key.partition('.')
+        nested.setdefault(section, OrderedDict())[name] = value
+    return nested
+
+
+def render(fmt, properties):
+    """Content of file of given format with properties."""
+
+    if fmt == 'properties':
+        return '\n'.join('{}={}'.format(key, value) for key, value in properties.items())
+    if fmt == 'json':
+        return json.dumps(nest(properties), indent=4)
+    if fmt == 'xml':
+        return '<configuration>\n{}\n</configuration>\n'.format('\n'.join(
+            '  <property name="{}">{}</property>'.format(key, value) for key, value in properties.items()
+        ))
+    if fmt == 'txt':
+        return '\n'.join('{} {}'.format(key, value) for key, value in properties.items())
+    return None  # yml is dumped by shaper
+
+
+def generate_tree(root, scale, seed=0):
+    """Write configuration files of all modules.
+
+    :param root: path to directory to generate tree in
+    :param scale: Scale of tree
+    :param seed: random seed
+    :return: paths of generated files
+    :rtype: list
+    """
+
+    rng = random.Random(seed)
+    paths = []
+    for module in range(scale.modules):
+        directory = os.path.join(root, 'module-{}'.format(module), RESOURCES)
+        manager.create_folders(directory)
+
+        for fmt in FORMATS:
+            for number in range(scale.files_per_format):
+                for env, properties in enumerate(generate_properties(rng, scale)):
+                    path = os.path.join(directory, 'config{}-env{}.{}'.format(number, env, fmt))
+                    content = render(fmt, properties)
+                    if content is None:
+                        libs.parser.write(nest(properties), path)
+                    else:
+                        with open(path, 'w') as _fd:
+                            _fd.write(content)
+                    paths.append(path)
+
+    return paths
+
+
+def generate_playbook(root, scale, seed=0):
+    """Write playbook with one template per module rendering properties of every environment.
+
+    :param root: path to directory to generate playbook in
+    :param scale: Scale of tree
+    :param seed: random seed
+    :return: path to playbook
+    :rtype: str
+    """
+
+    rng = random.Random(seed)
+    templates = []
+    variables = OrderedDict([('environments', ['env{}'.format(env) for env in range(scale.environments)])])
+
+    for module in range(scale.modules):
+        name = 'module-{}.j2'.format(module)
+        lines = ['module-{}:'.format(module), '  resources:', '{% for env in environments %}']
+        for number in range(scale.files_per_format):
+            lines.append('    application{}-{{{{ env }}}}.properties:'.format(number))
+            for key, value in generate_properties(rng, scale)[0].items():
+                variable = 'v{}_{}_{}'.format(module, number, len(variables))
+                if rng.random() < scale.duplication:
+                    lines.append("      {}: '{}'".format(key, value))
+                else:
+                    variables[variable] = value
+                    lines.append("      {}: '{{{{ {} }}}}-{{{{ env }}}}'".format(key, variable))
+        lines.append('{% endfor %}')
+
+        with open(os.path.join(root, name), 'w') as _fd:
+            _fd.write('\n'.join(lines) + '\n')
+        templates.append(name)
+
+    path = os.path.join(root, 'playbook.yml')
+    libs.parser.write(OrderedDict([('variables', variables), ('templates', templates)]), path)
+    return path
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('root')
+    defaults = Scale()
+    parser.add_argument('--modules', type=int, default=defaults.modules)
+    parser.add_argument('--environments', type=int, default=defaults.environments)
+    parser.add_argument('--files-per-format', type=int, default=defaults.files_per_format)
+    parser.add_argument('--keys', type=int, default=defaults.keys)
+    parser.add_argument('--duplication', type=float, default=defaults.duplication)
+    parser.add_argument('--seed', type=int, default=0)
+    arguments = parser.parse_args()
+
+    scale = Scale(
+        arguments.modules,
+        arguments.environments,
+        arguments.files_per_format,
+        arguments.keys,
+        arguments.duplication,
+    )
+    paths = generate_tree(os.path.join(arguments.root, 'tree'), scale, arguments.seed)
+    playbook = generate_playbook(arguments.root, scale, arguments.seed)
+    print('Generated {files} files in {root}, playbook {playbook}'.format(
+        files=len(paths), root=os.path.join(arguments.root, 'tree'), playbook=playbook,
+    ))
+
+
+if __name__ == '__main__':
+    main()
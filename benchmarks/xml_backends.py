@@ -0,0 +1,111 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""Compare XML backends: xmltodict/dicttoxml/minidom against lxml.
+
+Backends are timed directly, as XMLParser uses them. Commands are not
+affected: they keep .xml files as text, see PARSERS_MAPPING.
+
+Usage:
+    PYTHONPATH=. python benchmarks/xml_backends.py [--services N] [--repeat N]
+"""
+
+from __future__ import print_function
+
+import argparse
+import os
+import shutil
+import tempfile
+import timeit
+from collections import OrderedDict
+from xml.dom.minidom import parseString
+
+import xmltodict
+
+from shaper.libs import dicttoxml, lxml_backend
+
+
+def generate(services):
+    """Build descriptor-like data structure with `services` entries."""
+
+    return OrderedDict([(
+        'descriptor',
+        OrderedDict([(
+            'service',
+            [
+                OrderedDict([
+                    ('name', 'service-%d' % number),
+                    ('host', 'host-%d.example.com' % number),
+                    ('port', 8000 + number),
+                    ('enabled', 'true'),
+                    ('tags', ['tag-%d' % tag for tag in range(5)]),
+                    ('options', OrderedDict(
+                        ('option-%d' % option, 'value-%d' % option) for option in range(10)
+                    )),
+                ])
+                for number in range(services)
+            ],
+        )]),
+    )])
+
+
+def pure_python_write(data):
+    dom = parseString(
+        dicttoxml.dict_to_xml(
+            data,
+            fold_list=False,
+            item_func=lambda x: x,
+            attr_type=False,
+            root=False,
+        ),
+    )
+    return dom.toprettyxml(encoding='utf-8')
+
+
+def pure_python_read(path):
+    with open(path, 'r') as fd:
+        return xmltodict.parse(fd.read())
+
+
+def measure(func, repeat):
+    return min(timeit.repeat(func, number=1, repeat=repeat))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--services', type=int, default=5000)
+    parser.add_argument('--repeat', type=int, default=3)
+    arguments = parser.parse_args()
+
+    if not lxml_backend.AVAILABLE:
+        parser.error('lxml is not installed')
+
+    data = generate(arguments.services)
+    workdir = tempfile.mkdtemp()
+    path = os.path.join(workdir, 'descriptor.xml')
+
+    try:
+        with open(path, 'wb') as fd:
+            fd.write(lxml_backend.dict_to_xml(data))
+
+        size = os.path.getsize(path) / 1024.0 / 1024.0
+        print('Document: {services} services, {size:.1f} MB'.format(
+            services=arguments.services, size=size,
+        ))
+
+        results = [
+            ('write', 'dicttoxml+minidom', measure(lambda: pure_python_write(data), arguments.repeat)),
+            ('write', 'lxml', measure(lambda: lxml_backend.dict_to_xml(data), arguments.repeat)),
+            ('read', 'xmltodict', measure(lambda: pure_python_read(path), arguments.repeat)),
+            ('read', 'lxml', measure(lambda: lxml_backend.parse(path), arguments.repeat)),
+        ]
+    finally:
+        shutil.rmtree(workdir)
+
+    for direction, backend, seconds in results:
+        print('{direction:<6} {backend:<20} {seconds:8.3f}s'.format(
+            direction=direction, backend=backend, seconds=seconds,
+        ))
+
+
+if __name__ == '__main__':
+    main()
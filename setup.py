@@ -54,10 +54,12 @@ setup(
     ],
     entry_points={
         'console_scripts': [
-            'shaper = shaper.cli:main'
+            'shaper = shaper.cli:main',
+            'shaper-client = shaper.client:main',
         ]
     },
     extras_require={
-        'test': test_requires
+        'test': test_requires,
+        'lxml': 'lxml',
     }
 )
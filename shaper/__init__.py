@@ -11,9 +11,28 @@
 
 from . import libs
 
-from ._version import get_versions
 
-__version__ = get_versions()['version']
+def get_version():
+    """
+    Version of shaper
 
+    versioneer cmdclass of setup.py replaces _version.py in sdist and build
+    with the version fixed at build time, so installed package reads it
+    without probing anything. Source checkout asks git, on call only.
 
-__all__ = ['libs', '__version__']
+    :return: version
+    :rtype: str
+    """
+    from ._version import get_versions
+
+    return get_versions()['version']
+
+
+def __getattr__(name):
+    # PEP 562, python 3.7+: __version__ is looked up on first access, not on import
+    if name == '__version__':
+        return get_version()
+    raise AttributeError('module {module!r} has no attribute {name!r}'.format(module=__name__, name=name))
+
+
+__all__ = ['libs', 'get_version']
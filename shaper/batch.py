@@ -0,0 +1,255 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""shaper batch - run many shaper commands in one process
+
+Jobs are listed in YAML file:
+
+    jobs:
+      - name: backend
+        run: read backend/ -o backend.yml
+      - name: backend-config
+        run: write backend.yml -o out/backend
+        needs: [backend]
+      - run: [play, frontend/playbook.yml, -o, out/frontend, --write]
+
+Jobs without `needs` are independent and run concurrently in a pool of
+worker processes shared by all jobs, a job starts when jobs it needs
+succeeded. Every worker keeps parsed files and compiled templates of jobs
+it ran, so files used by many jobs are parsed once per worker.
+"""
+
+from __future__ import print_function
+
+import errno
+import multiprocessing
+import os
+import shlex
+import sys
+import time
+from collections import OrderedDict
+
+try:
+    import Queue as queue
+except ImportError:
+    import queue
+
+try:
+    from multiprocessing import SimpleQueue
+except ImportError:
+    from multiprocessing.queues import SimpleQueue
+
+from . import cli
+from . import libs
+from .server import WarmCache
+
+SKIPPED = 'skipped'
+
+# seconds between checks that workers running jobs are alive
+WATCH_INTERVAL = 0.5
+
+# warm caches of the current worker process, see _init_worker
+_WORKER_CACHE = None
+# queue worker reports (job name, pid) to when it starts job
+_WORKER_STARTED = None
+
+
+class Job(object):  # pylint: disable=too-few-public-methods
+    """Shaper command with names of jobs it needs."""
+
+    def __init__(self, name, argv, needs=()):
+        self.name = name
+        self.argv = argv
+        self.needs = list(needs)
+
+
+def load_jobs(path):
+    """
+    Load jobs from YAML file, list of jobs may be top level or under `jobs` key
+
+    :param path: path to jobs file
+    :type path: str
+
+    :return: jobs by name
+    :rtype: OrderedDict
+    """
+    declared = libs.parser.read(path)
+    if isinstance(declared, dict):
+        declared = declared.get('jobs')
+    if not isinstance(declared, list):
+        raise ValueError('{path} has no list of jobs'.format(path=path))
+
+    jobs = OrderedDict()
+    for number, entry in enumerate(declared):
+        if not isinstance(entry, dict):
+            entry = {'run': entry}
+
+        if 'run' not in entry:
+            raise ValueError('Job {name} has no run'.format(name=entry.get('name', number)))
+        argv = entry['run']
+        if not isinstance(argv, list):
+            argv = shlex.split(argv)
+
+        name = str(entry.get('name', number))
+        if name in jobs:
+            raise ValueError('Job {name} is declared twice'.format(name=name))
+        jobs[name] = Job(name, [str(arg) for arg in argv], entry.get('needs') or ())
+
+    check_needs(jobs)
+    return jobs
+
+
+def check_needs(jobs):
+    """
+    Check that jobs need only declared jobs and don't need each other,
+    so no job runs before broken needs are found
+
+    :param jobs: jobs by name
+    :type jobs: OrderedDict
+
+    :raises ValueError: if some job needs unknown job or needs form a cycle
+    """
+    for job in jobs.values():
+        for need in job.needs:
+            if need not in jobs:
+                raise ValueError('Job {name} needs unknown job {need}'.format(name=job.name, need=need))
+
+    done = set()
+
+    def visit(name, path):
+        if name in path:
+            cycle = path[path.index(name):] + [name]
+            raise ValueError('Jobs need each other: {names}'.format(names=' -> '.join(cycle)))
+        if name not in done:
+            for need in jobs[name].needs:
+                visit(need, path + [name])
+            done.add(name)
+
+    for name in jobs:
+        visit(name, [])
+
+
+def _init_worker(started=None):
+    global _WORKER_CACHE, _WORKER_STARTED  # pylint: disable=global-statement
+    _WORKER_CACHE = WarmCache()
+    _WORKER_STARTED = started
+
+
+def _run_job(argv, name=None):
+    if _WORKER_STARTED is not None:
+        _WORKER_STARTED.put((name, os.getpid()))
+
+    started = time.time()
+    response = cli.run_captured(argv, _WORKER_CACHE)
+    response['seconds'] = time.time() - started
+    return response
+
+
+def _failed(message):
+    return {'status': 1, 'stdout': '', 'stderr': message, 'seconds': 0.0}
+
+
+def _is_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except OSError as exc:
+        return exc.errno != errno.ESRCH
+    return True
+
+
+def run_jobs(jobs, processes=1):
+    """
+    Run jobs, concurrently if more than one process is allowed
+
+    :param jobs: jobs by name
+    :type jobs: OrderedDict
+
+    :param processes: number of worker processes
+    :type processes: int
+
+    :return: responses with status, stdout, stderr and seconds by job name,
+             in order of jobs; jobs whose needs failed have `skipped` status,
+             jobs whose worker raised or died have status 1
+    :rtype: OrderedDict
+    """
+    check_needs(jobs)
+    results = {}
+    pending = OrderedDict(jobs)
+
+    def ready():
+        for name, job in list(pending.items()):
+            if any(results.get(need, {}).get('status') not in (0, None) for need in job.needs):
+                del pending[name]
+                results[name] = {'status': SKIPPED, 'stdout': '', 'stderr': '', 'seconds': 0.0}
+            elif all(results.get(need, {}).get('status') == 0 for need in job.needs):
+                del pending[name]
+                yield job
+
+    if processes < 2:
+        _init_worker()
+        while pending:
+            jobs_ready = list(ready())
+            if not jobs_ready and pending:
+                raise ValueError('Jobs {names} need each other'.format(names=', '.join(pending)))
+            for job in jobs_ready:
+                results[job.name] = _run_job(job.argv)
+    else:
+        finished = queue.Queue()
+        # put is synchronous, report reaches queue even if worker dies right after it
+        started = SimpleQueue()
+        pool = multiprocessing.Pool(processes, _init_worker, (started,))
+        try:
+            running = {}  # pid of worker by name of running job, None until it starts
+            while pending or running:
+                for job in ready():
+                    options = {'callback': lambda response, name=job.name: finished.put((name, response))}
+                    if sys.version_info[0] > 2:
+                        options['error_callback'] = lambda exc, name=job.name: finished.put(
+                            (name, _failed('Job failed in worker: {error!r}\n'.format(error=exc))),
+                        )
+                    pool.apply_async(_run_job, (job.argv, job.name), **options)
+                    running[job.name] = None
+
+                if not running:
+                    if pending:
+                        raise ValueError('Jobs {names} need each other'.format(names=', '.join(pending)))
+                    break  # last jobs were skipped
+
+                try:
+                    name, response = finished.get(timeout=WATCH_INTERVAL)
+                except queue.Empty:
+                    # pool doesn't report killed worker, its job would never finish
+                    while not started.empty():
+                        name, pid = started.get()
+                        if name in running:
+                            running[name] = pid
+                    for name, pid in running.items():
+                        if pid is not None and not _is_alive(pid):
+                            finished.put((name, _failed('Worker running job died\n')))
+                    continue
+
+                if name in running:
+                    results[name] = response
+                    del running[name]
+        finally:
+            pool.terminate()
+            pool.join()
+
+    return OrderedDict((name, results[name]) for name in jobs)
+
+
+def report(results, stream=None):
+    """
+    Print output of every job after its header
+
+    :param results: result of run_jobs
+    :param stream: file like object, stdout if None
+    """
+    stream = stream or sys.stdout
+    for name, response in results.items():
+        stream.write('==> {name}: {status} ({seconds:.3f}s)\n'.format(
+            name=name,
+            status='ok' if response['status'] == 0 else response['status'],
+            seconds=response['seconds'],
+        ))
+        stream.write(response['stdout'])
+        stream.write(response['stderr'])
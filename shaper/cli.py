@@ -27,13 +27,36 @@ from __future__ import print_function
 
 import argparse
 import os
+import sys
+import traceback
 
 from collections import OrderedDict
 
+try:
+    from StringIO import StringIO
+except ImportError:
+    from io import StringIO
+
 from shaper import libs
 from shaper import manager
-from shaper.renderer import render_template
-from shaper.renderer import merge_templates
+from shaper import profiler
+
+# templates machinery (jinja2, yaml, multiprocessing) is imported
+# by the commands using it, so read and write start faster
+
+
+def parse_shard(value):
+    """Parse I/N shard argument to (index, count)."""
+
+    try:
+        index, count = (int(part) for part in value.split('/'))
+    except ValueError:
+        raise argparse.ArgumentTypeError('shard must be I/N, got {!r}'.format(value))
+
+    if not 0 <= index < count:
+        raise argparse.ArgumentTypeError('shard index must be from 0 to N-1, got {!r}'.format(value))
+
+    return index, count
 
 
 def construct_parser():
@@ -49,6 +72,40 @@ def construct_parser():
         help='Verbose output',
     )
 
+    parser.add_argument(
+        '--profile',
+        dest='profile',
+        action='store_true',
+        help='Print time spent in phases of command.',
+    )
+
+    parser.add_argument(
+        '--profile-stats',
+        dest='profile_stats',
+        default=None,
+        help='Save cProfile stats of command to file, implies --profile.',
+    )
+
+    parser.add_argument(
+        '--metrics',
+        dest='metrics',
+        default=None,
+        help='Write metrics of the run to file: files, bytes and keys '
+             'by extension, time by phase, peak memory.',
+    )
+
+    parser.add_argument(
+        '--metrics-format',
+        dest='metrics_format',
+        choices=profiler.METRICS_FORMATS,
+        default='json',
+        help='Format of metrics file, prometheus for node-exporter '
+             'textfile collector. Default json.',
+    )
+
+    # warm caches of `shaper serve`, commands run without them from command line
+    parser.set_defaults(cache=None)
+
     subparsers = parser.add_subparsers(
         dest='parser',
     )
@@ -68,6 +125,40 @@ def construct_parser():
         help='Run playbook like ansible.',
     )
 
+    compile_ = subparsers.add_parser(
+        'compile',
+        help='Compile playbook and its templates into bundle.',
+    )
+
+    diff = subparsers.add_parser(
+        'diff',
+        help='Compare datastructure with configuration in directory, '
+             'exit with status 1 if they differ.',
+    )
+
+    batch = subparsers.add_parser(
+        'batch',
+        help='Run read, write, play and diff jobs listed in YAML file '
+             'in one process, independent jobs concurrently.',
+    )
+
+    merge_ = subparsers.add_parser(
+        'merge',
+        help='Merge outputs of sharded reads into output of single read.',
+    )
+
+    query = subparsers.add_parser(
+        'query',
+        help='Print properties with key (and value) from store written by '
+             'read --store, exit with status 1 if there are none.',
+    )
+
+    serve = subparsers.add_parser(
+        'serve',
+        help='Serve read, write and play requests of shaper-client over '
+             'unix socket, keeping parsed files and compiled templates in memory.',
+    )
+
     read.add_argument(
         'src_path',
         type=str,
@@ -82,10 +173,47 @@ def construct_parser():
         help='Output file. Default out.yaml.',
     )
 
+    read.add_argument(
+        '--split',
+        dest='split',
+        default=None,
+        help='Write datastructure to directory as one YAML shard per service '
+             '(first level of tree with more than one key) and index.yml, '
+             'instead of output file.',
+    )
+
+    read.add_argument(
+        '--store',
+        dest='store',
+        default=None,
+        help='Update SQLite store of properties instead of writing output '
+             'file, only files changed since last update are parsed.',
+    )
+
+    read.add_argument(
+        '--shard',
+        dest='shard',
+        type=parse_shard,
+        default=None,
+        help='Read only shard I of N (I/N, I from 0) of files partitioned by '
+             'path hash. Partial outputs are joined by merge command.',
+    )
+
     write.add_argument(
         'src_structure',
         type=str,
-        help='Path to yaml with datastructure.',
+        help='Path to yaml with datastructure, directory written by '
+             'read --split or store written by read --store.',
+    )
+
+    write.add_argument(
+        '-j',
+        '--jobs',
+        dest='jobs',
+        type=int,
+        default=None,
+        help='Number of processes loading shards of split datastructure. '
+             'Default number of CPUs.',
     )
 
     write.add_argument(
@@ -100,14 +228,56 @@ def construct_parser():
         '-k',
         '--key',
         dest='key',
+        action='append',
         default=None,
-        help='Key for rendering custom subtree. Default render from root.',
+        help='Path pattern of subtree to render, may be repeated. Segments '
+             'may be globs, ** matches any number of segments, key without '
+             'glob characters matches paths containing it. Default render from root.',
+    )
+
+    write.add_argument(
+        '--strict-keys',
+        dest='strict_keys',
+        action='store_true',
+        help='Exit with status 1 if keys match no file, instead of warning.',
+    )
+
+    write.add_argument(
+        '--store',
+        dest='store',
+        action='store_true',
+        help='Datastructure is SQLite store written by read --store.',
+    )
+
+    write.add_argument(
+        '--no-snapshot',
+        dest='snapshot',
+        action='store_false',
+        help='Parse datastructure every time instead of using binary '
+             'snapshot kept next to it.',
+    )
+
+    write.add_argument(
+        '-w',
+        '--watch',
+        dest='watch',
+        action='store_true',
+        help='Keep watching datastructure after writing, '
+             'rewrite only files changed by its edits.',
+    )
+
+    write.add_argument(
+        '--interval',
+        dest='interval',
+        type=float,
+        default=0.1,
+        help='Seconds between checks of datastructure in watch mode. Default 0.1.',
     )
 
     play.add_argument(
         'src_path',
         type=str,
-        help='Path to playbook.',
+        help='Path to playbook or compiled bundle.',
     )
 
     play.add_argument(
@@ -118,50 +288,632 @@ def construct_parser():
         help='Path to output directory. Default ./out/.',
     )
 
+    play.add_argument(
+        '--cache-dir',
+        dest='cache_dir',
+        default=None,
+        help='Directory for compiled templates and incremental cache. '
+             'Default private directory of user in system temp directory.',
+    )
+
+    play.add_argument(
+        '-j',
+        '--jobs',
+        dest='jobs',
+        type=int,
+        default=None,
+        help='Number of parallel rendering processes. Default number of CPUs.',
+    )
+
+    play.add_argument(
+        '--merge',
+        dest='merge',
+        choices=['shallow', 'deep'],
+        default='shallow',
+        help='Replace top level keys (shallow) or merge nested mappings '
+             'reporting conflicts (deep). Default shallow.',
+    )
+
+    play.add_argument(
+        '-i',
+        '--incremental',
+        dest='incremental',
+        action='store_true',
+        help='Render only templates whose sources or variables changed '
+             'since the previous run, reuse cached output for the rest.',
+    )
+
+    play.add_argument(
+        '--stream',
+        dest='stream',
+        action='store_true',
+        help='Write output of single template to templates.yaml while rendering, '
+             'without loading it, so memory does not grow with output size. '
+             'Keys keep template order. Disables incremental mode.',
+    )
+
+    play.add_argument(
+        '-m',
+        '--matrix',
+        dest='matrix',
+        default=None,
+        help='YAML with variable sets by environment name. Playbook is rendered '
+             'once per environment into its own subdirectory of output directory.',
+    )
+
+    play.add_argument(
+        '-w',
+        '--write',
+        dest='write',
+        action='store_true',
+        help='Write properties files from merged templates '
+             'instead of dumping templates.yaml.',
+    )
+
+    compile_.add_argument(
+        'src_path',
+        type=str,
+        help='Path to playbook.',
+    )
+
+    compile_.add_argument(
+        '-o',
+        '--out',
+        dest='out',
+        default='bundle.zip',
+        help='Path to bundle. Default bundle.zip.',
+    )
+
+    diff.add_argument(
+        'src_structure',
+        type=str,
+        help='Path to yaml with datastructure.',
+    )
+
+    diff.add_argument(
+        'out',
+        type=str,
+        help='Path to configuration directory.',
+    )
+
+    diff.add_argument(
+        '-k',
+        '--key',
+        dest='key',
+        action='append',
+        default=None,
+        help='Path pattern of subtree to compare, as for write. '
+             'Files missing in datastructure are not reported then.',
+    )
+
+    diff.add_argument(
+        '--strict-keys',
+        dest='strict_keys',
+        action='store_true',
+        help='Exit with status 2 if keys match no file, instead of warning.',
+    )
+
+    diff.add_argument(
+        '--store',
+        dest='store',
+        action='store_true',
+        help='Datastructure is SQLite store written by read --store.',
+    )
+
+    diff.add_argument(
+        '--no-snapshot',
+        dest='snapshot',
+        action='store_false',
+        help='Parse datastructure every time instead of using binary '
+             'snapshot kept next to it.',
+    )
+
+    diff.add_argument(
+        '-j',
+        '--jobs',
+        dest='jobs',
+        type=int,
+        default=None,
+        help='Number of processes comparing files. Default number of CPUs.',
+    )
+
+    batch.add_argument(
+        'src_path',
+        type=str,
+        help='Path to YAML with jobs.',
+    )
+
+    batch.add_argument(
+        '-j',
+        '--jobs',
+        dest='jobs',
+        type=int,
+        default=None,
+        help='Number of worker processes running jobs. Default number of CPUs.',
+    )
+
+    merge_.add_argument(
+        'src_paths',
+        nargs='+',
+        help='Paths to outputs of read --shard.',
+    )
+
+    merge_.add_argument(
+        '-o',
+        '--out',
+        dest='out',
+        default='out.yml',
+        help='Output file. Default out.yaml.',
+    )
+
+    query.add_argument(
+        'store',
+        type=str,
+        help='Path to store written by read --store.',
+    )
+
+    query.add_argument(
+        'key',
+        type=str,
+        help='Dotted key of property, may be glob.',
+    )
+
+    query.add_argument(
+        'value',
+        nargs='?',
+        default=None,
+        help='Print only properties with value, JSON or plain string.',
+    )
+
+    query.add_argument(
+        '-l',
+        '--files',
+        dest='files',
+        action='store_true',
+        help='Print only paths of files.',
+    )
+
+    serve.add_argument(
+        '-s',
+        '--socket',
+        dest='socket',
+        default=None,
+        help='Path to unix socket. Default $SHAPER_SOCKET, shaper.sock in '
+             '$XDG_RUNTIME_DIR or shaper-<uid>.sock in system temp directory.',
+    )
+
     return parser
 
 
-def main():
-    parser = construct_parser()
-    arguments = parser.parse_args()
+def report_conflicts(conflicts):
+    for conflict in conflicts:
+        sys.stderr.write(
+            'Warning. Merge conflict at {path} in {source}: {old!r} -> {new!r}\n'.format(
+                path='/'.join(str(key) for key in conflict.path),
+                source=conflict.source,
+                old=conflict.old,
+                new=conflict.new,
+            ),
+        )
+
+
+def write_datastructure(datastructure, arguments, out=None):
+    if arguments.logging:
+        print('==> Files to render :')
+        print('\n'.join(datastructure.keys()))
+
+    manager.write_properties(datastructure, out or arguments.out)
+
+
+def get_reader(arguments):
+    """Get function reading files, cached when command is run by server."""
+
+    if arguments.cache is not None:
+        return arguments.cache.read
+    return libs.parser.read
+
+
+def read_matrix(path, context, reader=None):
+    """Read variable sets by environment name merged over playbook variables."""
+
+    reader = reader or libs.parser.read
+    contexts = OrderedDict()
+    for name, variables in reader(path).items():
+        contexts[name] = dict(context)
+        contexts[name].update(variables or {})
+
+    return contexts
+
+
+def play(arguments):
+    import multiprocessing
+    import yaml
+    from jinja2 import FileSystemLoader
+    from shaper import sources
+    from shaper.playbook import load_playbook
+    from shaper.renderer import RenderCache, merge, merge_templates, render_matrix, stream_matrix
+
+    reader = get_reader(arguments)
+    playbook, template_dir, loader_factory = load_playbook(arguments.src_path, reader)
+    context = playbook.get('variables', {})
+    templates = playbook.get('templates', [])
+
+    template_paths = [os.path.join(template_dir, template) for template in templates]
+
+    if arguments.matrix:
+        contexts = read_matrix(arguments.matrix, context, reader)
+    else:
+        # copy, playbook may be shared by server requests
+        contexts = {None: dict(context)}
+
+    try:
+        variable_sources = sources.from_playbook(playbook, template_dir)
+    except ValueError as exc:
+        sys.stderr.write('{error}\n'.format(error=exc))
+        sys.exit(2)
+    if variable_sources:
+        # batch constant lookups of all templates before rendering
+        with profiler.phase('prefetch lookups'):
+            variable_sources.prefetch(template_paths, loader_factory)
+        for variables in contexts.values():
+            variables[sources.LOOKUP] = variable_sources
+
+    render_caches = {}
+    if arguments.incremental and arguments.stream:
+        sys.stderr.write('Warning. Incremental mode is not supported for streaming\n')
+    elif arguments.incremental and loader_factory is not FileSystemLoader:
+        sys.stderr.write('Warning. Incremental mode is not supported for bundles\n')
+    elif arguments.incremental:
+        try:
+            render_caches = {
+                name: RenderCache.for_playbook(arguments.src_path, arguments.cache_dir, name)
+                for name in contexts
+            }
+        except RuntimeError as exc:
+            sys.stderr.write('Warning. Incremental mode is disabled. {error}\n'.format(error=exc))
+
+    jobs = arguments.jobs
+    bytecode_cache = None
+    if arguments.cache is not None:
+        # server and batch render in process with compiled templates kept in memory,
+        # unless more jobs are asked explicitly
+        jobs = jobs or 1
+        if multiprocessing.current_process().daemon:
+            jobs = 1  # batch worker is not allowed to start processes
+        bytecode_cache = arguments.cache.bytecode_cache
+
+    # one output tree per environment
+    out_dirs = OrderedDict(
+        (name, arguments.out if name is None else os.path.join(arguments.out, name)) for name in contexts
+    )
+
+    if arguments.stream and len(template_paths) == 1 and not arguments.write:
+        # nothing to merge, template output goes to templates.yaml as it's rendered
+        with profiler.phase('render'):
+            try:
+                stream_matrix(
+                    template_paths[0],
+                    out_dirs,
+                    contexts,
+                    cache_dir=arguments.cache_dir,
+                    jobs=jobs or multiprocessing.cpu_count(),
+                    loader_factory=loader_factory,
+                    bytecode_cache=bytecode_cache,
+                )
+            except (ValueError, yaml.YAMLError) as exc:
+                sys.stderr.write('{error}\n'.format(error=exc))
+                sys.exit(2)
+        return
+
+    if arguments.stream:
+        sys.stderr.write('Warning. Streaming to templates.yaml needs single template without --write, '
+                         'templates are loaded whole\n')
+
+    with profiler.phase('render'):
+        loaded = render_matrix(
+            template_paths,
+            contexts,
+            cache_dir=arguments.cache_dir,
+            jobs=jobs or multiprocessing.cpu_count(),
+            render_caches=render_caches,
+            loader_factory=loader_factory,
+            stream=arguments.stream,
+            bytecode_cache=bytecode_cache,
+        )
+
+    for render_cache in render_caches.values():
+        render_cache.save()
+
+    deep = arguments.merge == 'deep'
+    for name, loaded_templates in loaded.items():
+        out = out_dirs[name]
+
+        if arguments.write:
+            # hand merged structure to writer without YAML dump/load round trip
+            with profiler.phase('merge'):
+                merged, conflicts = merge(loaded_templates, deep=deep, names=templates)
+            write_datastructure(manager.backward_path_parser(merged), arguments, out)
+        else:
+            conflicts = merge_templates(loaded_templates, out, deep=deep, names=templates)
+
+        report_conflicts(conflicts)
+
+
+def compile_bundle(arguments):
+    from shaper.playbook import compile_playbook
+
+    compile_playbook(arguments.src_path, arguments.out)
+
+
+def diff(arguments):
+    import multiprocessing
+    from shaper import diff as diff_
+
+    datastructure = load_datastructure(arguments)
+    if datastructure is None or not datastructure and arguments.strict_keys:
+        sys.exit(2)
+
+    jobs = arguments.jobs or multiprocessing.cpu_count()
+    if arguments.cache is not None:
+        jobs = arguments.jobs or 1  # server and batch compare in process
+    if multiprocessing.current_process().daemon:
+        jobs = 1  # batch worker is not allowed to start processes
+
+    diffs = diff_.diff(
+        datastructure,
+        arguments.out,
+        jobs=jobs,
+        extra=not arguments.key,
+    )
+    diff_.report(diffs)
+
+    if diffs:
+        sys.exit(1)
 
-    if arguments.parser == 'play':
-        playbook = libs.parser.read(arguments.src_path)
-        context = playbook.get('variables', {})
-        templates = playbook.get('templates', [])
-        template_dir = os.path.dirname(arguments.src_path)
 
-        rendered_templates = [
-            render_template(os.path.join(template_dir, template), context) for template in templates
-        ]
+def batch(arguments):
+    import multiprocessing
+    from shaper import batch as batch_
 
-        merge_templates(rendered_templates, arguments.out)
+    try:
+        results = batch_.run_jobs(
+            batch_.load_jobs(arguments.src_path),
+            arguments.jobs or multiprocessing.cpu_count(),
+        )
+    except ValueError as exc:
+        sys.stderr.write('{error}\n'.format(error=exc))
+        sys.exit(2)
+    batch_.report(results)
 
-    elif arguments.parser == 'read':
-        gathered_data = manager.read_properties(arguments.src_path)
-        tree = manager.forward_path_parser(gathered_data)
+    if any(response['status'] != 0 for response in results.values()):
+        sys.exit(1)
 
+
+def serve(arguments):
+    from shaper import server
+
+    server.serve(arguments.socket)
+
+
+def read(arguments):
+    if arguments.store:
+        from shaper import store
+
+        connection = store.connect(arguments.store)
+        try:
+            store.update(connection, arguments.src_path, get_reader(arguments), arguments.shard)
+        finally:
+            connection.close()
+        return
+
+    gathered_data = manager.read_properties(arguments.src_path, get_reader(arguments), arguments.shard)
+    tree = manager.forward_path_parser(gathered_data)
+
+    if arguments.split:
+        from shaper import split
+
+        split.write_split(tree, arguments.split)
+    else:
         libs.parser.write(tree, arguments.out)
 
-    elif arguments.parser == 'write':
-        dict_data = libs.parser.read(arguments.src_structure)
-        datastructure = manager.backward_path_parser(dict_data)
 
-        # filter render files by key
-        if arguments.key:
-            datastructure = OrderedDict(
-                (key, value)
-                for key, value in datastructure.items() if arguments.key in key
-            )
+def query(arguments):
+    from shaper import store
+
+    connection = store.connect(arguments.store)
+    try:
+        rows = store.query(connection, arguments.key, arguments.value)
+    finally:
+        connection.close()
+
+    if arguments.files:
+        for path in OrderedDict((path, None) for path, _, _ in rows):
+            sys.stdout.write('{path}\n'.format(path=path))
+    else:
+        for path, key, value in rows:
+            sys.stdout.write('{path}: {key} = {value}\n'.format(path=path, key=key, value=value))
+
+    if not rows:
+        sys.exit(1)
+
 
-        if arguments.logging:
-            print('==> Files to render :')
-            print('\n'.join(datastructure.keys()))
+def merge_shards(arguments):
+    trees = [libs.parser.read(path) for path in arguments.src_paths]
+    if any(tree is None for tree in trees):
+        sys.exit(1)  # parse error is reported by parser
 
-        manager.write_properties(datastructure, arguments.out)
+    libs.parser.write(manager.merge_trees(trees), arguments.out)
 
+
+def check_selection(arguments, datastructure):
+    """Warn if keys select no files, so typo in key doesn't pass unnoticed."""
+
+    if arguments.key and not datastructure:
+        sys.stderr.write('Warning. No files match keys: {keys}\n'.format(keys=', '.join(arguments.key)))
+    return datastructure
+
+
+def load_datastructure(arguments):
+    if arguments.store:
+        from shaper import store
+
+        # files are selected in store, only their properties are decoded
+        connection = store.connect(arguments.src_structure)
+        try:
+            return check_selection(arguments, store.load(connection, arguments.key))
+        finally:
+            connection.close()
+
+    if os.path.isdir(arguments.src_structure):
+        import multiprocessing
+        from shaper import split
+
+        # load only shards which may have selected files
+        dict_data = split.load_split(
+            arguments.src_structure,
+            keys=arguments.key,
+            jobs=arguments.jobs or multiprocessing.cpu_count(),
+            reader=arguments.cache.read if arguments.cache is not None else None,
+        )
+    elif arguments.cache is None and arguments.snapshot and \
+            os.path.splitext(arguments.src_structure)[1] in ('.yml', '.yaml'):
+        from shaper import snapshot
+
+        # parsed DSL is reused until DSL changes, subtrees are decoded on demand
+        dict_data = snapshot.read(arguments.src_structure)
     else:
+        dict_data = get_reader(arguments)(arguments.src_structure)
+
+    if dict_data is None:
+        return None  # parse error is reported by parser
+
+    # render only subtrees selected by keys
+    if arguments.key:
+        return check_selection(arguments, manager.select_paths(dict_data, arguments.key))
+
+    return manager.backward_path_parser(dict_data)
+
+
+def watch_datastructure(arguments, written):
+    """Rewrite files changed in datastructure until interrupted."""
+
+    sys.stderr.write('Watching {path}\n'.format(path=arguments.src_structure))
+    try:
+        for _ in manager.watch(arguments.src_structure, arguments.interval):
+            datastructure = load_datastructure(arguments)
+            if datastructure is None:
+                continue  # keep last good version while file is being edited
+
+            changed = manager.changed_files(written, datastructure)
+            write_datastructure(
+                OrderedDict((key, datastructure[key]) for key in changed),
+                arguments,
+            )
+
+            for key in written:
+                if key not in datastructure:
+                    sys.stderr.write('Warning. {file} is not in datastructure anymore\n'.format(file=key))
+
+            written = datastructure
+    except KeyboardInterrupt:
+        pass
+
+
+def write(arguments):
+    if arguments.watch and arguments.cache is not None:
+        sys.stderr.write('Watch mode is not supported by server and batch\n')
+        sys.exit(2)
+
+    datastructure = load_datastructure(arguments)
+    if datastructure is None or not datastructure and arguments.strict_keys:
+        sys.exit(1)
+
+    write_datastructure(datastructure, arguments)
+
+    if arguments.watch:
+        watch_datastructure(arguments, datastructure)
+
+
+COMMANDS = {
+    'batch': batch,
+    'compile': compile_bundle,
+    'diff': diff,
+    'merge': merge_shards,
+    'play': play,
+    'query': query,
+    'read': read,
+    'serve': serve,
+    'write': write,
+}
+
+
+def run(parser, arguments):
+    command = COMMANDS.get(arguments.parser)
+    if not command:
         parser.print_help()
+    elif arguments.profile or arguments.profile_stats or arguments.metrics:
+        result = profiler.profile(arguments.profile_stats, command, arguments)
+        if arguments.profile or arguments.profile_stats:
+            result.report()
+        if arguments.metrics:
+            result.write_metrics(arguments.metrics, arguments.metrics_format, arguments.parser)
+        if result.exit is not None:
+            raise result.exit
+    else:
+        command(arguments)
+
+
+def run_captured(argv, cache=None, cwd=None):
+    """Run command capturing its output, for server and batch jobs.
+
+    :param argv: command line arguments without program name
+    :param cache: warm caches shared between commands
+    :param cwd: working directory of command, current one if None
+    :return: response with status, stdout and stderr
+    :rtype: dict
+    """
+
+    stdout, stderr = StringIO(), StringIO()
+    saved = sys.stdout, sys.stderr, os.getcwd()
+    status = 0
+
+    sys.stdout, sys.stderr = stdout, stderr
+    try:
+        if cwd:
+            os.chdir(cwd)
+        parser = construct_parser()
+        parser.prog = 'shaper'
+        arguments = parser.parse_args(argv)
+        arguments.cache = cache
+
+        if arguments.parser in ('batch', 'serve'):
+            sys.stderr.write('{command} can not be run by server or batch\n'.format(command=arguments.parser))
+            status = 2
+        else:
+            run(parser, arguments)
+
+    except SystemExit as exc:
+        status = profiler.exit_status(exc)
+
+    # pylint: disable=broad-except
+    # failures are reported to caller, server and batch keep running
+    except Exception:
+        traceback.print_exc()
+        status = 1
+
+    finally:
+        sys.stdout, sys.stderr = saved[:2]
+        if cwd:
+            os.chdir(saved[2])
+
+    return {'status': status, 'stdout': stdout.getvalue(), 'stderr': stderr.getvalue()}
+
+
+def main():
+    parser = construct_parser()
+    arguments = parser.parse_args()
+
+    run(parser, arguments)
 
 
 if __name__ == '__main__':
@@ -0,0 +1,141 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""shaper client - thin client of `shaper serve`
+
+Takes the same arguments as shaper and forwards them with the working
+directory to the server, so each run costs one round trip over unix socket
+instead of interpreter startup, imports and parsing. Runs command in process
+when server is not listening, but not when request fails after connecting:
+server may have run the command already. Only socket owned by the user and
+closed to others is trusted with arguments and output of commands.
+"""
+
+from __future__ import print_function
+
+import errno
+import json
+import os
+import socket
+import stat
+import sys
+import tempfile
+
+SOCKET_ENV = 'SHAPER_SOCKET'
+
+
+class ServerUnavailable(Exception):
+    """No server is listening on socket, command was not sent."""
+
+
+class UntrustedSocket(ServerUnavailable):
+    """Socket belongs to other user or is open to others, command was not sent."""
+
+
+def default_socket_path():
+    """
+    Socket path from $SHAPER_SOCKET, in private $XDG_RUNTIME_DIR
+    or per-user one in temp directory.
+    """
+
+    path = os.environ.get(SOCKET_ENV)
+    if path:
+        return path
+
+    runtime_dir = os.environ.get('XDG_RUNTIME_DIR')
+    if runtime_dir:
+        return os.path.join(runtime_dir, 'shaper.sock')
+
+    uid = os.getuid() if hasattr(os, 'getuid') else 0
+    return os.path.join(tempfile.gettempdir(), 'shaper-{uid}.sock'.format(uid=uid))
+
+
+def check_socket(socket_path):
+    """
+    Check that socket was created by server of current user, other user
+    may bind predictable path first to get commands and forge their output
+
+    :param socket_path: path to server socket
+    :raises ServerUnavailable: if there is no socket
+    :raises UntrustedSocket: if socket is not owned by user or is open to others
+    """
+
+    try:
+        stat_result = os.lstat(socket_path)
+    except OSError as exc:
+        if exc.errno == errno.ENOENT:
+            raise ServerUnavailable(str(exc))
+        raise
+
+    if not stat.S_ISSOCK(stat_result.st_mode):
+        raise UntrustedSocket('{path} is not a socket'.format(path=socket_path))
+    if stat_result.st_uid != os.getuid():
+        raise UntrustedSocket('{path} is owned by other user'.format(path=socket_path))
+    if stat.S_IMODE(stat_result.st_mode) & 0o077:
+        raise UntrustedSocket('{path} is open to other users'.format(path=socket_path))
+
+
+def request(argv, socket_path=None, cwd=None):
+    """Run shaper command by server.
+
+    :param argv: command line arguments without program name
+    :param socket_path: path to server socket, default_socket_path() if None
+    :param cwd: working directory of command, current one if None
+    :return: response with status, stdout and stderr
+    :rtype: dict
+    :raises ServerUnavailable: if server is not listening or its socket is not trusted
+    """
+
+    if not hasattr(socket, 'AF_UNIX'):
+        raise ServerUnavailable('unix sockets are not supported')
+
+    socket_path = socket_path or default_socket_path()
+    check_socket(socket_path)
+
+    client = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        try:
+            client.connect(socket_path)
+        except socket.error as exc:
+            if exc.errno in (errno.ENOENT, errno.ECONNREFUSED):
+                raise ServerUnavailable(str(exc))
+            raise
+
+        message = json.dumps({'argv': list(argv), 'cwd': cwd or os.getcwd()})
+        client.sendall(message.encode('utf-8') + b'\n')
+
+        chunks = []
+        while True:
+            chunk = client.recv(65536)
+            if not chunk:
+                break
+            chunks.append(chunk)
+    finally:
+        client.close()
+
+    return json.loads(b''.join(chunks).decode('utf-8'))
+
+
+def main():
+    try:
+        response = request(sys.argv[1:])
+    except ServerUnavailable as exc:
+        # no server (or no unix sockets), run command here
+        if isinstance(exc, UntrustedSocket):
+            sys.stderr.write('Warning. Socket is not trusted, running command without server: {error}\n'.format(
+                error=exc,
+            ))
+        from shaper import cli
+
+        return cli.main()
+    except (socket.error, OSError, IOError, ValueError) as exc:
+        # command may be half done by server, running it again is not safe
+        sys.stderr.write('Request to shaper server failed: {error}\n'.format(error=exc))
+        sys.exit(2)
+
+    sys.stdout.write(response['stdout'])
+    sys.stderr.write(response['stderr'])
+    sys.exit(response['status'])
+
+
+if __name__ == '__main__':
+    main()
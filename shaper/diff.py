@@ -0,0 +1,174 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""shaper diff - compare datastructure with configuration on disk
+
+Every file of flattened datastructure is dumped as `write` would do it and
+compared with file on disk by size first, then by content. Dumping is pure
+Python, so files are compared in a pool of processes. Only files that
+differ are parsed to report changed keys, in the calling process, so
+parsed files are counted by profiler.
+"""
+
+from __future__ import print_function
+
+import multiprocessing
+import os
+import sys
+from collections import OrderedDict, namedtuple
+
+from . import libs
+from . import manager
+
+MISSING = 'missing'
+EXTRA = 'extra'
+CHANGED = 'changed'
+
+FileDiff = namedtuple('FileDiff', 'path status changes')
+
+
+def flatten_keys(data, prefix=()):
+    """Leaf values of nested mappings by tuple of keys."""
+
+    flat = OrderedDict()
+    for key, value in data.items():
+        if isinstance(value, dict) and value:
+            flat.update(flatten_keys(value, prefix + (key,)))
+        else:
+            flat[prefix + (key,)] = value
+    return flat
+
+
+def diff_keys(actual, expected):
+    """
+    Key level changes turning actual data structure into expected one
+
+    :param actual: data structure of file on disk
+    :param expected: data structure of file from datastructure
+    :return: list of (sign, key, actual value, expected value), sign is
+             + for added, - for removed and ~ for changed key
+    :rtype: list
+    """
+    if not isinstance(actual, dict) or not isinstance(expected, dict):
+        return [] if actual == expected else [('~', (), actual, expected)]
+
+    actual, expected = flatten_keys(actual), flatten_keys(expected)
+    changes = []
+    for key, value in expected.items():
+        if key not in actual:
+            changes.append(('+', key, None, value))
+        elif actual[key] != value:
+            changes.append(('~', key, actual[key], value))
+
+    changes.extend(('-', key, value, None) for key, value in actual.items() if key not in expected)
+    return changes
+
+
+def compare_content(task):
+    """
+    Dump file of datastructure and compare it with file on disk by size, then by content
+
+    :param task: path relative to output directory, data structure, output directory
+    :return: path, status (None if file on disk is the same) and dumped
+             content if file differs
+    :rtype: tuple
+    """
+    path, data, out_dir = task
+    expected = libs.parser.dumps(data, path)
+    if expected is None:
+        return path, None, None  # write would not create it either
+
+    target = os.path.join(out_dir, path)
+    try:
+        size = os.path.getsize(target)
+    except OSError:
+        return path, MISSING, None
+
+    if size == len(expected):
+        with open(target, 'rb') as _fd:
+            if _fd.read() == expected:
+                return path, None, None
+
+    return path, CHANGED, expected
+
+
+def to_file_diff(result, out_dir):
+    """FileDiff of compare_content result, changed keys are found by parsing both sides."""
+
+    path, status, expected = result
+    if status != CHANGED:
+        return None if status is None else FileDiff(path, status, [])
+
+    # parse both sides the same way, so data types match
+    actual = libs.parser.read(os.path.join(out_dir, path))
+    expected = libs.parser.loads(expected.decode('utf-8'), path)
+    return FileDiff(path, CHANGED, diff_keys(actual, expected))
+
+
+def diff(datastructure, out_dir, jobs=8, extra=True):
+    """
+    Compare datastructure with configuration in directory
+
+    :param datastructure: files data structures by path, as given to manager.write_properties
+    :type datastructure: dict
+
+    :param out_dir: path to configuration directory
+    :type out_dir: str
+
+    :param jobs: number of processes comparing files
+    :type jobs: int
+
+    :param extra: report supported files on disk missing in datastructure
+    :type extra: bool
+
+    :return: differences in order of datastructure, then extra files
+    :rtype: list
+    """
+    tasks = [(path, data, out_dir) for path, data in datastructure.items()]
+    if jobs < 2 or len(tasks) < 2:
+        results = [compare_content(task) for task in tasks]
+    else:
+        pool = multiprocessing.Pool(min(jobs, len(tasks)))
+        try:
+            results = pool.map(compare_content, tasks)
+        finally:
+            pool.close()
+            pool.join()
+
+    diffs = [to_file_diff(result, out_dir) for result in results]
+    diffs = [file_diff for file_diff in diffs if file_diff is not None]
+
+    if extra:
+        managed = {os.path.normpath(path) for path in datastructure}
+        for filename in sorted(manager.walk_on_path(out_dir)):
+            path = os.path.relpath(filename, out_dir)
+            if os.path.normpath(path) not in managed:
+                diffs.append(FileDiff(path, EXTRA, []))
+
+    return diffs
+
+
+def report(diffs, stream=None):
+    """
+    Print differences: file status, then its changed keys
+
+    :param diffs: list of FileDiff
+    :param stream: file like object, stdout if None
+    """
+    stream = stream or sys.stdout
+    for file_diff in diffs:
+        stream.write('{status}: {path}\n'.format(status=file_diff.status, path=file_diff.path))
+        if file_diff.status == CHANGED and not file_diff.changes:
+            stream.write('    formatting only\n')
+
+        for sign, key, actual, expected in file_diff.changes:
+            key = '/'.join(str(part) for part in key) or '(content)'
+            if sign == '+':
+                line = '{key}: {expected!r}'
+            elif sign == '-':
+                line = '{key}: {actual!r}'
+            else:
+                line = '{key}: {actual!r} -> {expected!r}'
+            stream.write('  {sign} {line}\n'.format(
+                sign=sign,
+                line=line.format(key=key, actual=actual, expected=expected),
+            ))
@@ -12,12 +12,16 @@ data types, with arbitrary nesting for the collections. Items with a `datetime`
  empty XML elements.
 """
 
-import collections
+import itertools
 import logging
 import numbers
-from random import randint
 from xml.dom.minidom import parseString
 
+try:
+    from collections.abc import Iterable
+except ImportError:
+    from collections import Iterable
+
 try:
     unicode, long
 except NameError:
@@ -47,23 +51,19 @@ def unicode_me(something):
         return unicode(something)
 
 
-def make_id(element, start=100000, end=999999):
-    """Returns a random integer"""
-    return '%s_%s' % (element, randint(start, end))
+def make_id(element, number):
+    """Returns an id built from the element name and a sequence number"""
+    return '%s_%s' % (element, number)
 
 
-def get_unique_id(element):
-    """Returns a unique id for a given element"""
-    ids = []
-    this_id = make_id(element)
-    dup = True
-    while dup:
-        if this_id not in ids:
-            dup = False
-            ids.append(this_id)
-        else:
-            this_id = make_id(element)
-    return ids[-1]
+def get_unique_id(element, ids):
+    """Returns a unique id for a given element.
+
+    `ids` is the per-document counter created by `dict_to_xml`, so ids are
+    collision-free within a document and identical input always produces
+    identical ids.
+    """
+    return make_id(element, next(ids))
 
 
 def get_xml_type(val):
@@ -82,7 +82,7 @@ def get_xml_type(val):
         return 'null'
     if isinstance(val, dict):
         return 'dict'
-    if isinstance(val, collections.Iterable):
+    if isinstance(val, Iterable):
         return 'list'
 
     return type(val).__name__
@@ -177,7 +177,7 @@ def convert(obj, ids, attr_type, item_func, cdata, fold_list, parent='root'):
         return convert_dict(
             obj, ids, parent, attr_type, item_func, cdata, fold_list)
 
-    if isinstance(obj, collections.Iterable):
+    if isinstance(obj, Iterable):
         return convert_list(
             obj, ids, parent, attr_type, item_func, cdata, fold_list)
 
@@ -199,7 +199,7 @@ def convert_dict(obj, ids, parent, attr_type, item_func, cdata, fold_list):
             unicode_me(key), unicode_me(val), type(val).__name__,
         )
 
-        attr = {} if not ids else {'id': get_unique_id(parent)}
+        attr = {} if not ids else {'id': get_unique_id(parent, ids)}
 
         key, attr = make_valid_xml_name(key, attr)
 
@@ -227,7 +227,7 @@ def convert_dict(obj, ids, parent, attr_type, item_func, cdata, fold_list):
                 ),
             )
 
-        elif isinstance(val, collections.Iterable):
+        elif isinstance(val, Iterable):
             if attr_type:
                 attr['type'] = get_xml_type(val)
 
@@ -266,12 +266,12 @@ def convert_list(items, ids, parent, attr_type, item_func, cdata, fold_list):
         item_name = parent
 
     output = []
-    for i, item in enumerate(items):
+    for item in items:
         logger.info(
             'Looping inside convert_list(): item="%s", item_name="%s", type="%s"',
             unicode_me(item), item_name, type(item).__name__,
         )
-        attr = {} if not ids else {'id': '%s_%s' % (get_unique_id(parent), i + 1)}
+        attr = {} if not ids else {'id': get_unique_id(parent, ids)}
 
         if isinstance(item, (numbers.Number, str, unicode)):
             output.append(convert_kv(item_name, item, attr_type, cdata, **attr))
@@ -302,7 +302,7 @@ def convert_list(items, ids, parent, attr_type, item_func, cdata, fold_list):
                     ),
                 )
 
-        elif isinstance(item, collections.Iterable):
+        elif isinstance(item, Iterable):
             if not attr_type:
                 output.append(
                     '<%s%s>%s</%s>' % (
@@ -395,7 +395,8 @@ def dict_to_xml(
       Default is True
     - custom_root allows you to specify a custom root element.
       Default is 'root'
-    - ids specifies whether elements get unique ids.
+    - ids specifies whether elements get unique ids. Ids are generated from
+      a per-document counter, so the output is reproducible.
       Default is False
     - attr_type specifies whether elements get a data type attribute.
       Default is True
@@ -410,6 +411,8 @@ def dict_to_xml(
         type(obj).__name__, unicode_me(obj),
     )
 
+    ids = itertools.count(1) if ids else None
+
     output = []
     if root:
         output.append('<?xml version="1.0" encoding="UTF-8" ?>')
@@ -0,0 +1,175 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""Optional lxml backend for XML read and write.
+
+Produces the same data structures as `xmltodict.parse` and the same element
+layout as `dicttoxml.dict_to_xml` (as called by `XMLParser`), but does the
+parsing and serialization in lxml's C code. Check `AVAILABLE` before use:
+lxml is not a hard dependency.
+
+Only `XMLParser` uses it: `.xml` files are mapped to `TextParser` in
+PARSERS_MAPPING, so read, write, diff, split and store keep them as text.
+"""
+
+import numbers
+from collections import OrderedDict
+
+try:
+    from lxml import etree
+except ImportError:
+    etree = None
+
+try:
+    unicode
+except NameError:
+    unicode = str  # pylint: disable=redefined-builtin
+
+AVAILABLE = etree is not None
+
+ATTR_PREFIX = '@'
+TEXT_KEY = '#text'
+
+
+def _qualified_name(name, nsmap):
+    """Turn lxml `{uri}local` name back into `prefix:local` form."""
+
+    if not name.startswith('{'):
+        return name
+
+    uri, local = name[1:].split('}', 1)
+    for prefix, namespace in nsmap.items():
+        if namespace == uri and prefix:
+            return '%s:%s' % (prefix, local)
+    return local
+
+
+def _element_to_dict(element, parent_nsmap):
+    """Convert element to xmltodict compatible (name, value) pair."""
+
+    nsmap = element.nsmap
+    item = OrderedDict()
+
+    for prefix, uri in nsmap.items():
+        if parent_nsmap.get(prefix) != uri:
+            name = 'xmlns:%s' % prefix if prefix else 'xmlns'
+            item[ATTR_PREFIX + name] = uri
+
+    for name, value in element.attrib.items():
+        item[ATTR_PREFIX + _qualified_name(name, nsmap)] = value
+
+    text = [element.text or '']
+    for child in element:
+        text.append(child.tail or '')
+        if not isinstance(child.tag, (str, unicode)):
+            continue  # comments and processing instructions
+
+        key, value = _element_to_dict(child, nsmap)
+        if key not in item:
+            item[key] = value
+        elif isinstance(item[key], list):
+            item[key].append(value)
+        else:
+            item[key] = [item[key], value]
+
+    data = ''.join(text).strip() or None
+    if not item:
+        return _qualified_name(element.tag, nsmap), data
+
+    if data:
+        item[TEXT_KEY] = data
+    return _qualified_name(element.tag, nsmap), item
+
+
+def parse(path):
+    """Parse XML file into xmltodict compatible data structure.
+
+    :param path: string path to file or binary file object
+    :return: XML data structure
+    :rtype: OrderedDict
+    """
+
+    xml_parser = etree.XMLParser(
+        remove_comments=True,
+        remove_pis=True,
+        resolve_entities=False,
+        no_network=True,
+        huge_tree=True,
+    )
+    root = etree.parse(path, xml_parser).getroot()
+    key, value = _element_to_dict(root, {})
+
+    return OrderedDict([(key, value)])
+
+
+def _make_element(parent, key):
+    """Create child element, fixing the name like `dicttoxml` does."""
+
+    key = unicode(key)
+    try:
+        return etree.SubElement(parent, key)
+    except ValueError:
+        pass
+
+    if key.isdigit():
+        return etree.SubElement(parent, 'n%s' % key)
+
+    try:
+        return etree.SubElement(parent, key.replace(' ', '_'))
+    except ValueError:
+        return etree.SubElement(parent, 'key', name=key)
+
+
+def _fill(element, value):
+    """Put value into element according to its type."""
+
+    if value is None:
+        return
+
+    if isinstance(value, (numbers.Number, str, unicode)):
+        element.text = unicode(value)
+
+    elif hasattr(value, 'isoformat'):
+        element.text = value.isoformat()
+
+    elif isinstance(value, dict):
+        for key, item in value.items():
+            _append(element, key, item)
+
+    else:
+        for item in value:
+            _fill(etree.SubElement(element, element.tag), item)
+
+
+def _append(parent, key, value):
+    """Append value to parent, lists unfolded into repeated elements."""
+
+    if isinstance(value, (list, tuple, set)):
+        for item in value:
+            _fill(_make_element(parent, key), item)
+    else:
+        _fill(_make_element(parent, key), value)
+
+
+def dict_to_xml(data):
+    """Serialize data structure into pretty printed XML document.
+
+    :param data: dict with a single root element
+    :return: XML document
+    :rtype: bytes
+    """
+
+    holder = etree.Element('holder')
+    for key, value in data.items():
+        _append(holder, key, value)
+
+    if len(holder) != 1:
+        raise ValueError(
+            'XML document must have exactly one root element, got %d' % len(holder),
+        )
+
+    return etree.tostring(
+        holder[0],
+        pretty_print=True,
+        xml_declaration=True,
+        encoding='utf-8',
+    )
@@ -22,27 +22,19 @@
         TBD
 """
 
-import json
 import os
 import sys
 from collections import OrderedDict
-from xml.dom.minidom import parseString
 
 try:
     from StringIO import StringIO
 except ImportError:
     from io import StringIO
 
-import xmltodict
-import yaml
+from .. import profiler
 
-from . import dicttoxml
-from .loader import (
-    OrderedDictYAMLLoader,
-    represent_ordered_dict,
-    represent_unicode,
-    represent_multi_line,
-)
+# format libraries are imported by parsers on first use,
+# so CLI does not pay for formats it doesn't touch
 
 
 class BaseParser(object):
@@ -71,13 +63,22 @@ class BaseParser(object):
 
         parser_class = self.parsers_choice(path)
         if parser_class:
+            ext = os.path.splitext(path)[1]
             try:
-                return parser_class().read(path)
+                with profiler.phase('read {ext}'.format(ext=ext)):
+                    data = parser_class().read(path)
+
+                if profiler.ACTIVE is not None:
+                    profiler.count('files_parsed', ext)
+                    profiler.count('bytes_read', ext, os.path.getsize(path))
+                    profiler.count('keys_read', ext, profiler.count_keys(data))
+                return data
 
             # pylint: disable=broad-except
             # disable cause of list of exceptions
             # not known due to a lot of parsers
             except Exception as exc:
+                profiler.count('files_failed', ext)
                 msg = 'Failed to parse {file}'.format(file=os.path.abspath(path))
                 sys.stderr.write(
                     '{message}\n{exception}\n'.format(message=msg, exception=exc),
@@ -85,6 +86,34 @@ class BaseParser(object):
 
         sys.stderr.write(self.WARNING_MESSAGE.format(file=path))
 
+    def loads(self, content, path):
+        """Load data structure from content of file according its type.
+
+        :param content: file content
+        :param path: string path to file, only its extension is used
+        :return: File data structure, None for unsupported type
+        :rtype: [dict, list]
+        """
+
+        parser_class = self.parsers_choice(path)
+        if parser_class:
+            return parser_class().loads(content)
+        return None
+
+    def dumps(self, data, path):
+        """Dump data structure to content of file according its type.
+
+        :param data: data
+        :param path: string path to file, only its extension is used
+        :return: file content, None for unsupported type
+        :rtype: bytes
+        """
+
+        parser_class = self.parsers_choice(path)
+        if parser_class:
+            return parser_class().dumps(data)
+        return None
+
     def write(self, data, path):
         """Write data in file according its type. Default type choose dynamic
         with magic function.
@@ -99,19 +128,25 @@ class BaseParser(object):
 
         parser_class = self.parsers_choice(path)
         if parser_class:
-            parser_class().write(data, path)
+            ext = os.path.splitext(path)[1]
+            with profiler.phase('write {ext}'.format(ext=ext)):
+                parser_class().write(data, path)
+
+            if profiler.ACTIVE is not None and os.path.exists(path):
+                profiler.count('files_written', ext)
+                profiler.count('bytes_written', ext, os.path.getsize(path))
         else:
             sys.stderr.write(self.WARNING_MESSAGE.format(file=path))
 
 
 class TextParser(object):
 
-    def read(self, path):
+    def read_content(self, path):
         """Read plaintext file.
 
         :param path: string path to file
-        :return: list of lines of string
-        :rtype: [list, str]
+        :return: file content
+        :rtype: str
         """
 
         try:
@@ -123,56 +158,101 @@ class TextParser(object):
                 'Failed to read {file}: {msg}'.format(file=path, msg=str(exc)),
             )
 
-    def write(self, data, path):
+    def write_content(self, content, path):
         """Write plaintext file.
 
-        :param data: file content
+        :param content: file content
         :param path: string path to file
-        :return: str
+        :type content: bytes
 
         :return: None
         :rtype: None
         """
 
-        if isinstance(data, str):
-            data = bytearray(data, 'utf-8')
+        if content is None:
+            return
 
         try:
             with open(path, 'wb') as fd:
-                fd.write(data)
+                fd.write(content)
 
         except (ValueError, OSError, IOError) as exc:
             sys.stderr.write(
                 'Failed to write {file}: {msg}'.format(file=path, msg=str(exc)),
             )
 
+    def loads(self, content):
+        """Load data structure from file content.
 
-class YAMLParser(TextParser):
+        :param content: file content
+        :return: data structure
+        """
+
+        return content
+
+    def dumps(self, data):
+        """Dump data structure to file content.
+
+        :param data: data structure
+        :return: file content, None if there is nothing to write
+        :rtype: bytes
+        """
+
+        if isinstance(data, str):
+            data = bytearray(data, 'utf-8')
+
+        return bytes(data)
 
     def read(self, path):
-        """YAML read.
+        """Read file data structure.
 
         :param path: string path to file
         :return: data structure
-        :rtype: dict
         """
 
-        return yaml.load(
-            super(YAMLParser, self).read(path),
-            Loader=OrderedDictYAMLLoader,
-        )
+        return self.loads(self.read_content(path))
 
     def write(self, data, path):
-        """Dump data structure to YAML.
+        """Write data structure to file.
 
-        :param data: configuration dataset
+        :param data: data structure
         :param path: string path to file
-        :type data: dict
 
         :return: None
         :rtype: None
         """
 
+        self.write_content(self.dumps(data), path)
+
+
+class YAMLParser(TextParser):
+
+    def loads(self, content):
+        """YAML load.
+
+        :param content: file content
+        :return: data structure
+        :rtype: dict
+        """
+
+        import yaml
+        from .loader import OrderedDictYAMLLoader
+
+        return yaml.load(content, Loader=OrderedDictYAMLLoader)
+
+    def dumps(self, data):
+        """Dump data structure to YAML.
+
+        :param data: configuration dataset
+        :type data: dict
+
+        :return: file content
+        :rtype: bytes
+        """
+
+        import yaml
+        from .loader import represent_ordered_dict, represent_unicode, represent_multi_line
+
         yaml.add_representer(OrderedDict, represent_ordered_dict)
         if sys.version_info[0] == 2:
             yaml.add_representer(
@@ -189,44 +269,44 @@ class YAMLParser(TextParser):
             allow_unicode=True,
         )
 
-        if sys.version_info[0] == 3:
-            content = bytearray(content, 'utf-8')
-
-        super(YAMLParser, self).write(content, path)
+        return super(YAMLParser, self).dumps(content)
 
 
 class JSONParser(TextParser):
 
-    def read(self, path):
-        """JSON read.
+    def loads(self, content):
+        """JSON load.
 
-        :param path: string path to file
+        :param content: file content
         :return: json data structure
         :rtype: dict
         """
 
-        return json.loads(super(JSONParser, self).read(path))
+        import json
 
-    def write(self, data, path):
+        return json.loads(content)
+
+    def dumps(self, data):
         """Dump data to JSON.
 
         :param data: configuration data structure
-        :param path: string path to file
         :type data: dict
 
-        :return: None
-        :rtype: None
+        :return: file content
+        :rtype: bytes
         """
 
+        import json
+
         kw = {'encoding': 'utf-8'} if sys.version_info[0] == 2 else {}
-        with open(path, 'w') as fd:
-            json.dump(
-                data,
-                fd,
-                indent=4,
-                separators=(',', ': '),
-                **kw
-            )
+        content = json.dumps(
+            data,
+            indent=4,
+            separators=(',', ': '),
+            **kw
+        )
+
+        return super(JSONParser, self).dumps(content)
 
 
 class XMLParser(TextParser):
@@ -239,19 +319,50 @@ class XMLParser(TextParser):
         :rtype: dict
         """
 
-        return xmltodict.parse(super(XMLParser, self).read(path))
+        from . import lxml_backend
 
-    def write(self, data, path):
+        if lxml_backend.AVAILABLE:
+            return lxml_backend.parse(path)
+
+        return super(XMLParser, self).read(path)
+
+    def loads(self, content):
+        """XML load.
+
+        :param content: file content
+        :return: XML data structure
+        :rtype: dict
+        """
+
+        from . import lxml_backend
+
+        if lxml_backend.AVAILABLE:
+            from io import BytesIO
+
+            return lxml_backend.parse(BytesIO(content.encode('utf-8')))
+
+        import xmltodict
+
+        return xmltodict.parse(content)
+
+    def dumps(self, data):
         """Dump data structure to XML.
 
         :param data: configuration data structure
-        :param path: string path to file
         :type data: dict
 
-        :return: None
-        :rtype: None
+        :return: file content
+        :rtype: bytes
         """
 
+        from . import lxml_backend
+
+        if lxml_backend.AVAILABLE:
+            return lxml_backend.dict_to_xml(data)
+
+        from xml.dom.minidom import parseString
+        from . import dicttoxml
+
         dom = parseString(
             dicttoxml.dict_to_xml(
                 data,
@@ -262,7 +373,7 @@ class XMLParser(TextParser):
             ),
         )
 
-        super(XMLParser, self).write(dom.toprettyxml(encoding='utf-8'), path)
+        return dom.toprettyxml(encoding='utf-8')
 
 
 class PropertyParser(TextParser):
@@ -274,10 +385,10 @@ class PropertyParser(TextParser):
             return "\n  ".join(string_splitted)
         return string
 
-    def read(self, path):
-        """PROPERTY read.
+    def loads(self, content):
+        """PROPERTY load.
 
-        :param path: string path to file
+        :param content: file content
         :return: property data structure
         :rtype: dict
         """
@@ -287,8 +398,6 @@ class PropertyParser(TextParser):
         except ImportError:
             import configparser as ConfigParser
 
-        content = super(PropertyParser, self).read(path)
-
         config = StringIO()
         config.write('[dummy_section]\n')
         config.write(content.replace('%', '%%'))
@@ -301,27 +410,23 @@ class PropertyParser(TextParser):
 
         return OrderedDict(conf_parser.items('dummy_section'))
 
-    def write(self, data, path):
+    def dumps(self, data):
         """Dump data structure to property.
 
         :param data: configuration data structure
-        :param path: string path to file
         :type data: dict
 
-        :return: None
-        :rtype: None
+        :return: file content, None for empty data
+        :rtype: bytes
         """
 
         if data is None:
-            return
+            return None
 
         stream = '\n'.join(
             '{}={}'.format(item[0], self._process_multiline_string(item[1])) for item in data.items()
         )
-        super(PropertyParser, self).write(
-            stream.encode(encoding='utf-8'),
-            path,
-        )
+        return stream.encode(encoding='utf-8')
 
 
 parser = BaseParser()
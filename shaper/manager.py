@@ -4,8 +4,13 @@
 
 import fnmatch
 import os
+import time
+import zlib
+from collections import OrderedDict
 
 from . import libs
+from . import profiler
+from .profiler import phase
 
 
 def walk_on_path(path):
@@ -27,11 +32,32 @@ def create_folders(path_to_folder):
             raise EOFError
 
 
-def read_properties(_dir):
-    """Interface for reading properties recursively."""
+def shard_of(filename, _dir, count):
+    """Shard of file, stable across hosts and checkout locations."""
+
+    relative = os.path.relpath(filename, _dir).replace(os.sep, '/')
+    return (zlib.crc32(relative.encode('utf-8')) & 0xffffffff) % count
+
+
+def read_properties(_dir, reader=None, shard=None):
+    """Interface for reading properties recursively.
+
+    :param shard: (index, count) to read only files of one shard
+    """
+
+    reader = reader or libs.parser.read
+    with phase('walk_on_path'):
+        filenames = list(walk_on_path(_dir))
+
+    if shard is not None:
+        index, count = shard
+        filenames = [filename for filename in filenames if shard_of(filename, _dir, count) == index]
+
+    for filename in filenames:
+        profiler.count('files_discovered', os.path.splitext(filename)[1])
 
     result = {
-        filename: libs.parser.read(filename) for filename in walk_on_path(_dir)
+        filename: reader(filename) for filename in filenames
     }
 
     return {key: value for key, value in result.items() if value}
@@ -45,9 +71,11 @@ def write_properties(datastructure, path):
             path,
             os.path.dirname(filename)
         )
-        create_folders(directories)
+        with phase('create_folders'):
+            create_folders(directories)
 
         property_file = os.path.basename(filename)
+        profiler.count('keys_written', os.path.splitext(filename)[1], profiler.count_keys(properties))
         libs.parser.write(
             properties,
             os.path.join(directories, property_file),
@@ -75,10 +103,11 @@ def forward_path_parser(_input):
             create_keys_recursively(keys[0], current_tree[key])
 
     output = {}
-    for key, value in _input.items():
-        keys = key.split('/')
+    with phase('forward_path_parser'):
+        for key, value in _input.items():
+            keys = key.split('/')
 
-        create_keys_recursively(keys[0], output)
+            create_keys_recursively(keys[0], output)
 
     return output
 
@@ -97,6 +126,181 @@ def backward_path_parser(_input):
                 path_builder(_value, _key)
 
     output = {}
-    path_builder(_input)
+    with phase('backward_path_parser'):
+        path_builder(_input)
 
     return output
+
+
+# markers in nodes of KeyPatterns trie
+_END = object()  # pattern ends at node
+_LOOP = object()  # node is reached by `**`, it matches any number of segments
+
+
+class KeyPatterns(object):
+    """
+    Trie of path patterns over segments, segment may be glob and `**`
+    matches any number of segments. Plain keys without glob characters
+    match paths containing them, as `**/*key*`.
+    """
+
+    GLOB_CHARS = '*?['
+
+    def __init__(self, keys):
+        self.root = {}
+        for key in keys:
+            if not any(char in key for char in self.GLOB_CHARS):
+                key = '**/*{key}*'.format(key=key)
+
+            node = self.root
+            for segment in key.strip('/').split('/'):
+                child = node.get(segment)
+                if child is None:
+                    child = node[segment] = {_LOOP: True} if segment == '**' else {}
+                node = child
+            node[_END] = True
+
+    @staticmethod
+    def closure(nodes):
+        """Add nodes reachable by `**` matching no segments."""
+
+        result = []
+        pending = list(nodes)
+        while pending:
+            node = pending.pop()
+            if any(node is seen for seen in result):
+                continue
+            result.append(node)
+            if '**' in node:
+                pending.append(node['**'])
+        return result
+
+    def advance(self, nodes, segment):
+        """Nodes of patterns matching one more segment."""
+
+        result = []
+        for node in nodes:
+            if _LOOP in node:
+                result.append(node)
+            for pattern, child in node.items():
+                if pattern in (_END, _LOOP, '**'):
+                    continue
+                if fnmatch.fnmatchcase(segment, pattern):
+                    result.append(child)
+        return self.closure(result)
+
+    def may_match(self, segments):
+        """Whether patterns may match path starting with segments."""
+
+        nodes = self.closure([self.root])
+        for segment in segments:
+            if any(_END in node for node in nodes):
+                return True  # whole subtree is selected
+            nodes = self.advance(nodes, segment)
+        return bool(nodes)
+
+    def select(self, tree):
+        """
+        Flatten only subtrees and files matching patterns,
+        unrelated branches of tree are not walked.
+
+        :param tree: nested data structure
+        :return: files by path
+        :rtype: OrderedDict
+        """
+
+        output = OrderedDict()
+
+        def walk(current_tree, key, nodes):
+            for _key, _value in current_tree.items():
+                path = key + '/' + _key if key else _key
+                matched = self.advance(nodes, _key)
+                if not matched:
+                    continue
+
+                if any(_END in node for node in matched):
+                    if '.' in path:
+                        output[path] = _value
+                    else:
+                        for filename, properties in backward_path_parser(_value).items():
+                            output[path + '/' + filename] = properties
+                elif '.' not in path:
+                    walk(_value, path, matched)
+
+        with phase('select_paths'):
+            walk(tree, '', self.closure([self.root]))
+
+        return output
+
+
+def select_paths(tree, keys):
+    """Files of nested structure matching any of path patterns, see KeyPatterns."""
+
+    return KeyPatterns(keys).select(tree)
+
+
+def merge_trees(trees):
+    """
+    Merge partial trees of sharded reads into tree of single read.
+    Every file is in one of trees, so only directories are merged:
+    key present in several trees is a directory and its value is plain
+    dict, as forward_path_parser makes it.
+
+    :param trees: list of nested data structures
+    :return: merged tree
+    :rtype: dict
+    """
+
+    output = {}
+    for tree in trees:
+        for key in tree or {}:
+            if key in output:
+                continue
+
+            values = [other[key] for other in trees if other and key in other]
+            if len(values) == 1:
+                output[key] = values[0]
+            elif all(isinstance(value, dict) for value in values):
+                output[key] = merge_trees(values)
+            elif all(value == values[0] for value in values):
+                output[key] = values[0]
+            else:
+                raise ValueError('Partial trees have different values of {key}'.format(key=key))
+
+    return output
+
+
+def changed_files(old, new):
+    """Files of new plain datastructure differing from old one, in order of new."""
+
+    return [
+        filename for filename, properties in new.items()
+        if filename not in old or old[filename] != properties
+    ]
+
+
+def watch(path, interval=0.1):
+    """Poll file or files of directory, yield each time modification time or size changes."""
+
+    def signature():
+        try:
+            if os.path.isdir(path):
+                # directory of files, as split datastructure
+                entries = []
+                for name in sorted(os.listdir(path)):
+                    stat_result = os.stat(os.path.join(path, name))
+                    entries.append((name, stat_result.st_mtime, stat_result.st_size))
+                return tuple(entries)
+
+            stat_result = os.stat(path)
+        except OSError:
+            return None  # editors may replace file by rename
+        return stat_result.st_mtime, stat_result.st_size
+
+    last = signature()
+    while True:
+        time.sleep(interval)
+        current = signature()
+        if current is not None and current != last:
+            last = current
+            yield
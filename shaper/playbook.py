@@ -0,0 +1,135 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""shaper playbook - load playbooks and compile them to bundles"""
+
+import json
+import os
+import sys
+import zipfile
+
+import jinja2
+import yaml
+
+from jinja2 import FileSystemLoader, ModuleLoader, TemplateSyntaxError
+from . import libs
+from .libs.loader import OrderedDictYAMLLoader
+from .renderer import TemplateRenderer
+
+BUNDLE_VERSION = 1
+MANIFEST = 'manifest.json'
+PLAYBOOK = 'playbook.yml'
+TEMPLATES = 'templates'
+
+
+class BundleLoaderFactory(object):  # pylint: disable=too-few-public-methods
+    """
+    Create loaders of templates precompiled into bundle,
+    picklable to be passed to rendering worker processes
+    """
+
+    def __init__(self, bundle_path, directories):
+        self.bundle_path = bundle_path
+        self.directories = directories
+
+    def __call__(self, template_dir):
+        return ModuleLoader(
+            os.path.join(self.bundle_path, TEMPLATES, self.directories[template_dir]),
+        )
+
+
+def load_playbook(path, reader=None):
+    """
+    Load playbook from YAML file or precompiled bundle
+
+    :param path: path to playbook or bundle
+    :type path: str
+
+    :param reader: function reading YAML playbook, libs.parser.read if None
+
+    :return: playbook, templates directory and templates loader factory
+    :rtype: tuple
+    """
+    if not zipfile.is_zipfile(path):
+        reader = reader or libs.parser.read
+        return reader(path), os.path.dirname(path), FileSystemLoader
+
+    with zipfile.ZipFile(path) as bundle:
+        manifest = json.loads(bundle.read(MANIFEST).decode('utf-8'))
+        if manifest['version'] != BUNDLE_VERSION or manifest['jinja2'] != jinja2.__version__:
+            raise ValueError(
+                'Bundle {path} was compiled by other version of shaper or Jinja2, '
+                'compile it again'.format(path=path),
+            )
+
+        playbook = yaml.load(bundle.read(PLAYBOOK), Loader=OrderedDictYAMLLoader)
+
+    loader_factory = BundleLoaderFactory(os.path.abspath(path), manifest['directories'])
+    return playbook, '', loader_factory
+
+
+def compile_playbook(playbook_path, bundle_path):
+    """
+    Compile playbook with templates it uses into bundle: zip archive with
+    playbook, manifest and templates compiled to python modules
+
+    :param playbook_path: path to playbook
+    :type playbook_path: str
+
+    :param bundle_path: path to bundle
+    :type bundle_path: str
+
+    :return: None
+    """
+    with open(playbook_path, 'rb') as _fd:
+        playbook_source = _fd.read()
+
+    templates = libs.parser.read(playbook_path).get('templates', [])
+    template_dir = os.path.dirname(playbook_path)
+    template_renderer = TemplateRenderer({})
+    directories = {}
+    compiled = set()
+
+    with zipfile.ZipFile(bundle_path, 'w', zipfile.ZIP_DEFLATED) as bundle:
+        for template in templates:
+            directory = directories.setdefault(
+                os.path.dirname(template),
+                str(len(directories)),
+            )
+            template_path = os.path.join(template_dir, template)
+            env = template_renderer.get_environment(os.path.dirname(template_path))
+
+            collected, dynamic = template_renderer.collect_templates(template_path)
+            sources = [(name, source, filename) for name, source, filename, _ in collected]
+            if dynamic:
+                sys.stderr.write(
+                    'Warning. {template} references templates by expression, '
+                    'compile whole directory\n'.format(template=template),
+                )
+                for name in env.list_templates():
+                    try:
+                        source, filename, _ = env.loader.get_source(env, name)
+                    except UnicodeDecodeError:
+                        continue
+                    sources.append((name, source, filename))
+
+            for name, source, filename in sources:
+                target = '/'.join([TEMPLATES, directory, ModuleLoader.get_module_filename(name)])
+                if target in compiled:
+                    continue
+
+                try:
+                    code = env.compile(source, name, filename, raw=True, defer_init=True)
+                except TemplateSyntaxError:
+                    if not dynamic:
+                        raise
+                    continue  # not every file in directory is a template
+
+                bundle.writestr(target, code)
+                compiled.add(target)
+
+        bundle.writestr(PLAYBOOK, playbook_source)
+        bundle.writestr(MANIFEST, json.dumps({
+            'version': BUNDLE_VERSION,
+            'jinja2': jinja2.__version__,
+            'directories': directories,
+        }))
@@ -0,0 +1,301 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""shaper profiler - time spent in phases of a command and run metrics
+
+Code marks its phases with `with phase('name'):` and counts processed
+files with `count(name, ext)`, which cost nothing unless command is run
+by `profile`. Then wall and CPU time and number of calls are summed up by
+phase name, counters by name and file extension, to be printed as a table
+or exported as JSON or Prometheus textfile.
+"""
+
+from __future__ import print_function
+
+import os
+import sys
+import time
+from collections import OrderedDict
+
+try:
+    import resource
+except ImportError:  # windows
+    resource = None
+
+clock = getattr(time, 'perf_counter', time.time)
+cpu_clock = getattr(time, 'process_time', getattr(time, 'clock', None))
+
+# profiler of running command, see profile
+ACTIVE = None
+
+METRICS_FORMATS = ('json', 'prometheus')
+
+COUNTERS_HELP = OrderedDict([
+    ('files_discovered', 'Files found by walking source directory.'),
+    ('files_parsed', 'Files parsed successfully.'),
+    ('files_failed', 'Files failed to parse.'),
+    ('files_written', 'Files written.'),
+    ('bytes_read', 'Bytes of parsed files.'),
+    ('bytes_written', 'Bytes of written files.'),
+    ('keys_read', 'Leaf keys of parsed files.'),
+    ('keys_written', 'Leaf keys of written files.'),
+    ('snapshots_read', 'DSL files loaded from snapshot instead of parsing.'),
+    ('snapshot_bytes_read', 'Bytes of loaded snapshots.'),
+])
+
+
+class _NullPhase(object):
+
+    def __enter__(self):
+        return None
+
+    def __exit__(self, *exc_info):
+        return False
+
+
+NULL_PHASE = _NullPhase()
+
+
+class _Phase(object):
+
+    def __init__(self, stats):
+        self.stats = stats
+        self.started = None
+        self.cpu_started = None
+
+    def __enter__(self):
+        self.started = clock()
+        self.cpu_started = cpu_clock()
+
+    def __exit__(self, *exc_info):
+        self.stats[0] += 1
+        self.stats[1] += clock() - self.started
+        self.stats[2] += cpu_clock() - self.cpu_started
+        return False
+
+
+def count_keys(data):
+    """Number of leaf keys in nested mappings."""
+
+    if not isinstance(data, dict):
+        return 0
+    return sum(count_keys(value) if isinstance(value, dict) else 1 for value in data.values())
+
+
+def exit_status(exc):
+    """Exit status of process exiting with SystemExit, 0 if None."""
+
+    if exc is None or exc.code is None:
+        return 0
+    return exc.code if isinstance(exc.code, int) else 1
+
+
+def peak_rss():
+    """Peak resident set size of the process in bytes, None if unknown."""
+
+    if resource is None:
+        return None
+
+    maxrss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # kilobytes on linux, bytes on macOS
+    return maxrss if sys.platform == 'darwin' else maxrss * 1024
+
+
+def _label(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+class Profiler(object):
+    """Calls, wall and CPU seconds by phase name, counters by name and extension."""
+
+    def __init__(self):
+        self.phases = OrderedDict()
+        self.counters = OrderedDict()
+        self.wall = 0.0
+        self.cpu = 0.0
+        # SystemExit of the command, raised again once profile is reported
+        self.exit = None
+
+    def phase(self, name):
+        stats = self.phases.get(name)
+        if stats is None:
+            stats = self.phases[name] = [0, 0.0, 0.0]
+        return _Phase(stats)
+
+    def count(self, name, ext, value=1):
+        key = (name, ext)
+        self.counters[key] = self.counters.get(key, 0) + value
+
+    def report(self, stream=None):
+        """Print table of phases.
+
+        :param stream: file like object, stderr if None
+        """
+
+        stream = stream or sys.stderr
+        width = max([len(name) for name in self.phases] + [len('total')])
+        row = '{name:<{width}}  {calls:>8}  {seconds:>10}  {cpu:>10}  {percent:>6}\n'
+
+        stream.write(row.format(
+            name='phase', width=width, calls='calls', seconds='seconds', cpu='cpu', percent='%',
+        ))
+        for name, (calls, seconds, cpu) in self.phases.items():
+            stream.write(row.format(
+                name=name,
+                width=width,
+                calls=calls,
+                seconds='{:.4f}'.format(seconds),
+                cpu='{:.4f}'.format(cpu),
+                percent='{:.1f}'.format(100.0 * seconds / self.wall if self.wall else 0.0),
+            ))
+        stream.write(row.format(
+            name='total',
+            width=width,
+            calls='',
+            seconds='{:.4f}'.format(self.wall),
+            cpu='{:.4f}'.format(self.cpu),
+            percent='100.0',
+        ))
+
+    def metrics(self, command=None):
+        """Collected metrics as plain data structure.
+
+        :param command: name of profiled command
+        :rtype: dict
+        """
+
+        counters = OrderedDict()
+        for (name, ext), value in self.counters.items():
+            counters.setdefault(name, OrderedDict())[ext] = value
+
+        return OrderedDict([
+            ('command', command),
+            ('exit_status', exit_status(self.exit)),
+            ('wall_seconds', self.wall),
+            ('cpu_seconds', self.cpu),
+            ('peak_rss_bytes', peak_rss()),
+            ('counters', counters),
+            ('phases', OrderedDict(
+                (name, OrderedDict([('calls', calls), ('wall_seconds', seconds), ('cpu_seconds', cpu)]))
+                for name, (calls, seconds, cpu) in self.phases.items()
+            )),
+        ])
+
+    def prometheus(self, command=None):
+        """Collected metrics in Prometheus text exposition format.
+
+        :param command: name of profiled command
+        :rtype: str
+        """
+
+        metrics = self.metrics(command)
+        common = 'command="{}"'.format(_label(command or ''))
+        lines = []
+
+        def add(name, kind, help_text, samples):
+            lines.append('# HELP shaper_{name} {help}'.format(name=name, help=help_text))
+            lines.append('# TYPE shaper_{name} {kind}'.format(name=name, kind=kind))
+            for labels, value in samples:
+                lines.append('shaper_{name}{{{labels}}} {value!r}'.format(
+                    name=name,
+                    labels=','.join([common] + labels),
+                    value=value,
+                ))
+
+        add('run_exit_status', 'gauge', 'Exit status of the run.', [([], metrics['exit_status'])])
+        add('run_wall_seconds', 'gauge', 'Wall time of the run.', [([], metrics['wall_seconds'])])
+        add('run_cpu_seconds', 'gauge', 'CPU time of the run.', [([], metrics['cpu_seconds'])])
+        if metrics['peak_rss_bytes'] is not None:
+            add('peak_rss_bytes', 'gauge', 'Peak resident set size.', [([], metrics['peak_rss_bytes'])])
+
+        for name, help_text in COUNTERS_HELP.items():
+            by_ext = metrics['counters'].get(name)
+            if by_ext:
+                add(name + '_total', 'counter', help_text, [
+                    (['ext="{}"'.format(_label(ext))], value) for ext, value in by_ext.items()
+                ])
+
+        for name, field, kind, help_text in (
+                ('phase_calls_total', 'calls', 'counter', 'Calls of phase.'),
+                ('phase_wall_seconds', 'wall_seconds', 'gauge', 'Wall time spent in phase.'),
+                ('phase_cpu_seconds', 'cpu_seconds', 'gauge', 'CPU time spent in phase.'),
+        ):
+            add(name, kind, help_text, [
+                (['phase="{}"'.format(_label(phase_name))], stats[field])
+                for phase_name, stats in metrics['phases'].items()
+            ])
+
+        return '\n'.join(lines) + '\n'
+
+    def write_metrics(self, path, metrics_format='json', command=None):
+        """Write metrics file, atomically for textfile collectors.
+
+        :param path: path to metrics file
+        :param metrics_format: json or prometheus
+        :param command: name of profiled command
+        """
+
+        if metrics_format == 'prometheus':
+            content = self.prometheus(command)
+        else:
+            import json
+
+            content = json.dumps(self.metrics(command), indent=4) + '\n'
+
+        temp_path = '{path}.{pid}.tmp'.format(path=path, pid=os.getpid())
+        with open(temp_path, 'w') as _fd:
+            _fd.write(content)
+        os.rename(temp_path, path)
+
+
+def phase(name):
+    """Context manager timing phase of running command, no-op without profiler."""
+
+    if ACTIVE is None:
+        return NULL_PHASE
+    return ACTIVE.phase(name)
+
+
+def count(name, ext, value=1):
+    """Add value to counter of running command, no-op without profiler."""
+
+    if ACTIVE is not None:
+        ACTIVE.count(name, ext, value)
+
+
+def profile(stats_path, func, *args):
+    """Run function timing its phases.
+
+    Command exiting through sys.exit is a regular result, e.g. diff with
+    differences, its SystemExit is kept in `exit` of returned profiler.
+
+    :param stats_path: path to save cProfile stats to, not profiled if None
+    :param func: function to run
+    :return: profiler with collected phases
+    :rtype: Profiler
+    """
+
+    global ACTIVE  # pylint: disable=global-statement
+    ACTIVE = profiler = Profiler()
+
+    c_profile = None
+    if stats_path:
+        import cProfile
+
+        c_profile = cProfile.Profile()
+        c_profile.enable()
+
+    started = clock()
+    cpu_started = cpu_clock()
+    try:
+        func(*args)
+    except SystemExit as exc:
+        profiler.exit = exc
+    finally:
+        profiler.wall = clock() - started
+        profiler.cpu = cpu_clock() - cpu_started
+        ACTIVE = None
+        if c_profile is not None:
+            c_profile.disable()
+            c_profile.dump_stats(stats_path)
+
+    return profiler
@@ -3,13 +3,42 @@
 """shaper renderer - tools to working with templates"""
 from __future__ import print_function
 
+import errno
+import hashlib
+import json
+import multiprocessing
 import os
+import stat
+import tempfile
+from collections import namedtuple
+
 import yaml
 
-from jinja2 import Environment, FileSystemLoader, Undefined
+from jinja2 import BytecodeCache, Environment, FileSystemBytecodeCache, FileSystemLoader, Undefined, meta, nodes
 from . import manager
 
 
+# name of lookup function of variable sources, see shaper.sources
+LOOKUP = 'lookup'
+
+
+def is_constant_lookup(call):
+    """Whether call is lookup with constant source and key."""
+
+    if not isinstance(call.node, nodes.Name) or call.node.name != LOOKUP:
+        return False
+
+    args = call.args[:2]
+    return len(args) == 2 and all(isinstance(arg, nodes.Const) for arg in args)
+
+
+def has_dynamic_lookups(ast):
+    """Whether template uses lookup other than with constant source and key."""
+
+    constant = set(id(call.node) for call in ast.find_all(nodes.Call) if is_constant_lookup(call))
+    return any(name.name == LOOKUP and id(name) not in constant for name in ast.find_all(nodes.Name))
+
+
 class IgnoreUndefinedAttr(Undefined):  # pylint: disable=too-few-public-methods
     """
     Class for ignoring undefined attributes
@@ -26,6 +55,165 @@ class IgnoreUndefinedAttr(Undefined):  # pylint: disable=too-few-public-methods
 #     return value
 
 
+class TemplateRenderer(object):
+    """
+    Render templates sharing one Jinja2 environment per template directory,
+    so loaded templates are cached and context is copied into globals once
+    """
+
+    def __init__(self, context, bytecode_cache=None, loader_factory=FileSystemLoader):
+        self.context = context
+        self.bytecode_cache = bytecode_cache
+        self.loader_factory = loader_factory
+        self.environments = {}
+        # without context in globals, to see which variables templates read
+        self.analysis_environment = Environment()
+
+    def get_environment(self, template_dir):
+        """
+        Get environment for templates from directory
+
+        :param template_dir: path to templates directory
+        :type template_dir: str
+
+        :return: environment
+        :rtype: jinja2.Environment
+        """
+        env = self.environments.get(template_dir)
+        if env is None:
+            env = Environment(
+                loader=self.loader_factory(template_dir),
+                undefined=IgnoreUndefinedAttr,
+                bytecode_cache=self.bytecode_cache,
+                # finalize=represent_none_as_empty_string
+            )
+            env.globals.update(self.context)
+            self.environments[template_dir] = env
+
+        return env
+
+    def render(self, template_path):
+        """
+        Render template
+
+        :param template_path: path to template
+        :type template_path: str
+
+        :return: rendered template
+        :rtype: str
+        """
+        env = self.get_environment(os.path.dirname(template_path))
+        template = env.get_template(os.path.basename(template_path))
+        return template.render()
+
+    def generate(self, template_path):
+        """
+        Render template chunk by chunk
+
+        :param template_path: path to template
+        :type template_path: str
+
+        :return: generator of rendered template chunks
+        :rtype: generator
+        """
+        env = self.get_environment(os.path.dirname(template_path))
+        template = env.get_template(os.path.basename(template_path))
+        return template.generate()
+
+    def collect_templates(self, template_path):
+        """
+        Collect template and templates it includes, imports or extends
+
+        :param template_path: path to template
+        :type template_path: str
+
+        :return: list of (name, source, filename, ast) and flag whether
+                 some templates are referenced by expression
+        :rtype: tuple
+        """
+        env = self.get_environment(os.path.dirname(template_path))
+        pending = [os.path.basename(template_path)]
+        seen = set(pending)
+        collected = []
+        dynamic = False
+
+        while pending:
+            name = pending.pop()
+            source, filename, _ = env.loader.get_source(env, name)
+            ast = self.analysis_environment.parse(source)
+            collected.append((name, source, filename, ast))
+
+            for reference in meta.find_referenced_templates(ast):
+                if reference is None:
+                    dynamic = True
+                elif reference not in seen:
+                    seen.add(reference)
+                    pending.append(reference)
+
+        return collected, dynamic
+
+    def find_dependencies(self, template_path):
+        """
+        Find files and variables template output depends on: template source,
+        included/imported/extended templates and variables they read
+
+        :param template_path: path to template
+        :type template_path: str
+
+        :return: hashes of files by path and sorted variable names,
+                 None if template references templates by expression or
+                 looks up keys built at render time
+        :rtype: tuple
+        """
+        collected, dynamic = self.collect_templates(template_path)
+        if dynamic or any(has_dynamic_lookups(ast) for _, _, _, ast in collected):
+            return None
+
+        files = {}
+        variables = set()
+        for _, source, filename, ast in collected:
+            files[filename] = hash_content(source.encode('utf-8'))
+            variables.update(meta.find_undeclared_variables(ast))
+
+        return files, sorted(variables)
+
+
+def create_bytecode_cache(cache_dir=None):
+    """
+    Create on-disk cache for compiled templates
+
+    :param cache_dir: path to cache directory, system temp directory if None
+
+    :return: bytecode cache
+    :rtype: jinja2.FileSystemBytecodeCache
+    """
+    if cache_dir:
+        manager.create_folders(cache_dir)
+    return FileSystemBytecodeCache(cache_dir)
+
+
+class MemoryBytecodeCache(BytecodeCache):
+    """
+    In-process cache of compiled templates for long running server,
+    keeps code objects to skip both compiling and unmarshalling.
+    Jinja2 drops entry once template source checksum changes.
+    """
+
+    def __init__(self):
+        self.entries = {}
+
+    def load_bytecode(self, bucket):
+        entry = self.entries.get(bucket.key)
+        if entry is not None and entry[0] == bucket.checksum:
+            bucket.code = entry[1]
+
+    def dump_bytecode(self, bucket):
+        self.entries[bucket.key] = (bucket.checksum, bucket.code)
+
+    def clear(self):
+        self.entries.clear()
+
+
 def render_template(template_path, context):
     """
     Render template interface
@@ -39,31 +227,590 @@ def render_template(template_path, context):
     :return: rendered template
     :rtype: str
     """
+    return TemplateRenderer(context).render(template_path)
+
+
+class GeneratorReader(object):  # pylint: disable=too-few-public-methods
+    """
+    File-like object reading text from generator of chunks, to load
+    template output with YAML loader without materializing it
+    """
+
+    def __init__(self, chunks):
+        self.chunks = iter(chunks)
+        self.buffer = u''
+
+    def read(self, size=-1):
+        """
+        Read at most size characters, everything left if size is negative
+
+        :param size: number of characters
+        :type size: int
+
+        :return: text
+        :rtype: str
+        """
+        parts = [self.buffer]
+        length = len(self.buffer)
+        while size < 0 or length < size:
+            try:
+                chunk = next(self.chunks)
+            except StopIteration:
+                break
+            parts.append(chunk)
+            length += len(chunk)
+
+        data = u''.join(parts)
+        if size < 0:
+            self.buffer = u''
+            return data
+
+        self.buffer = data[size:]
+        return data[:size]
 
-    env = Environment(
-        loader=FileSystemLoader(os.path.dirname(template_path)),
-        undefined=IgnoreUndefinedAttr
-        # finalize=represent_none_as_empty_string
+
+def hash_content(content):
+    return hashlib.sha1(content).hexdigest()
+
+
+def hash_variables(context, names):
+    """
+    Hash values of variables
+
+    :param context: variables
+    :type context: dict
+
+    :param names: names of variables to hash
+    :type names: list
+
+    :return: hex digest
+    :rtype: str
+    """
+    values = json.dumps(
+        [[name, context.get(name)] for name in names],
+        sort_keys=True,
+        default=repr,
     )
-    env.globals.update(context)
-    template = env.get_template(os.path.basename(template_path))
-    return template.render()
+    return hash_content(values.encode('utf-8'))
+
+
+def user_cache_dir():
+    """
+    Private directory of current user in system temp directory, as jinja2
+    creates for bytecode cache. Rendered templates may contain secrets and
+    shared temp directory lets other users read or plant cache files.
+
+    :return: path to directory
+    :rtype: str
+    :raises RuntimeError: if directory exists and isn't private directory of the user
+    """
+    tmpdir = tempfile.gettempdir()
+    if not hasattr(os, 'getuid'):
+        return tmpdir  # windows, temp directory is per user
+
+    path = os.path.join(tmpdir, 'shaper-cache-{uid}'.format(uid=os.getuid()))
+    try:
+        os.mkdir(path, 0o700)
+    except OSError as exc:
+        if exc.errno != errno.EEXIST:
+            raise RuntimeError('Unable to create cache directory {path}: {error}'.format(path=path, error=exc))
+
+    actual = os.lstat(path)
+    if actual.st_uid != os.getuid() or not stat.S_ISDIR(actual.st_mode):
+        raise RuntimeError('Cache directory {path} is not owned by current user'.format(path=path))
+    if stat.S_IMODE(actual.st_mode) != 0o700:
+        os.chmod(path, 0o700)
+    return path
+
 
+class RenderCache(object):
+    """
+    Rendered templates stored between play runs with their dependencies,
+    template is rendered again only if some dependency changed
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.entries = {}
+        self.used = {}
+
+        if os.path.isfile(path):
+            try:
+                with open(path, 'r') as _fd:
+                    self.entries = json.load(_fd)
+            except (ValueError, OSError, IOError):
+                pass  # corrupted or unreadable cache is the same as empty
+
+    @staticmethod
+    def for_playbook(playbook_path, cache_dir=None, environment=None):
+        """
+        Create cache stored in cache directory for playbook
+
+        :param playbook_path: path to playbook
+        :param cache_dir: path to cache directory, private directory of user
+                          in system temp directory if None
+        :param environment: name of variable set playbook is rendered with
+
+        :return: render cache
+        :rtype: RenderCache
+        :raises RuntimeError: if default cache directory isn't private
+        """
+        if cache_dir:
+            manager.create_folders(cache_dir)
+        else:
+            cache_dir = user_cache_dir()
+        key = os.path.abspath(playbook_path)
+        if environment is not None:
+            key = '{}:{}'.format(key, environment)
+        name = hash_content(key.encode('utf-8'))
+        return RenderCache(os.path.join(cache_dir, 'shaper-play-{}.json'.format(name)))
+
+    def get(self, template_path, context):
+        """
+        Get rendered template if it's dependencies are unchanged
+
+        :param template_path: path to template
+        :param context: variables
+
+        :return: rendered template or None
+        :rtype: str
+        """
+        entry = self.entries.get(template_path)
+        if not entry:
+            return None
+
+        for filename, digest in entry['files'].items():
+            try:
+                with open(filename, 'rb') as _fd:
+                    if hash_content(_fd.read()) != digest:
+                        return None
+            except (OSError, IOError):
+                return None
+
+        if hash_variables(context, entry['variables']) != entry['variables_hash']:
+            return None
+
+        self.used[template_path] = entry
+        return entry['output']
+
+    def set(self, template_path, context, output, dependencies):
+        """
+        Store rendered template
+
+        :param template_path: path to template
+        :param context: variables
+        :param output: rendered template
+        :param dependencies: result of TemplateRenderer.find_dependencies
+        """
+        if dependencies is None:
+            return
+
+        files, variables = dependencies
+        self.used[template_path] = {
+            'files': files,
+            'variables': variables,
+            'variables_hash': hash_variables(context, variables),
+            'output': output,
+        }
+
+    def save(self):
+        """Store entries used by this run, forget the rest. File is readable only by the user."""
+        # mkstemp creates file with mode 0600, replacing doesn't follow planted links
+        temp_fd, temp_path = tempfile.mkstemp(
+            prefix='{}.'.format(os.path.basename(self.path)),
+            dir=os.path.dirname(self.path) or '.',
+        )
+        try:
+            with os.fdopen(temp_fd, 'w') as _fd:
+                json.dump(self.used, _fd)
+            getattr(os, 'replace', os.rename)(temp_path, self.path)
+        except BaseException:
+            os.remove(temp_path)
+            raise
+
+
+# renderers of the current worker process by variable set, see _init_worker
+_WORKER_RENDERERS = {}
+
+
+def _create_renderers(contexts, cache_dir, loader_factory, bytecode_cache=None):
+    # one bytecode cache for all variable sets: template is compiled once
+    bytecode_cache = bytecode_cache or create_bytecode_cache(cache_dir)
+    return {
+        name: TemplateRenderer(context, bytecode_cache, loader_factory)
+        for name, context in contexts.items()
+    }
+
+
+def _init_worker(contexts, cache_dir, loader_factory):
+    global _WORKER_RENDERERS  # pylint: disable=global-statement
+    _WORKER_RENDERERS = _create_renderers(contexts, cache_dir, loader_factory)
+
+
+def _render_and_load(template_renderer, task):
+    """
+    Render template unless cached output given and load it
 
-def merge_templates(rendered_templates, out_dir):
+    :return: loaded template, rendered template and dependencies
+             if template was rendered
+    :rtype: tuple
     """
-    Merge templates
+    template_path, cached, track, stream = task
+    if cached is not None:
+        return yaml.safe_load(cached), None, None
 
-    :param rendered_templates: list of rendered templates to merge
+    if stream:
+        return yaml.safe_load(GeneratorReader(template_renderer.generate(template_path))), None, None
 
+    rendered = template_renderer.render(template_path)
+    dependencies = template_renderer.find_dependencies(template_path) if track else None
+    return yaml.safe_load(rendered), rendered, dependencies
+
+
+def _safe_mapping_events(events, template_path):
+    """
+    Pass YAML events of template output which safe_load would accept as
+    single mapping, the way merge of loaded templates expects it
+    """
+    documents = 0
+    root = False
+    for event in events:
+        if root and not isinstance(event, yaml.MappingStartEvent):
+            raise ValueError('Template {path} does not render mapping'.format(path=template_path))
+        root = isinstance(event, yaml.DocumentStartEvent)
+        documents += root
+        if documents > 1:
+            raise ValueError('Template {path} renders more than one document'.format(path=template_path))
+
+        tag = getattr(event, 'tag', None)
+        if tag not in (None, '!') and tag not in yaml.SafeLoader.yaml_constructors:
+            raise ValueError('Template {path} uses unsafe tag {tag}'.format(path=template_path, tag=tag))
+        if isinstance(event, yaml.CollectionStartEvent):
+            event.flow_style = False  # block style, as yaml.dump of loaded template
+
+        yield event
+
+    if not documents:
+        raise ValueError('Template {path} does not render mapping'.format(path=template_path))
+
+
+def stream_template(template_renderer, template_path, out_dir):
+    """
+    Render template chunk by chunk straight to templates.yaml through YAML
+    parser and emitter events. Neither rendered text nor loaded structure
+    is kept in memory, keys stay in template order.
+
+    :param template_renderer: renderer with variables
+    :param template_path: path to template
     :param out_dir: path to rendered templates
 
-    :return: None
+    :return: path to written file
+    :rtype: str
     """
-    dict_base = {}
-    for var in rendered_templates:
-        dict_base.update(yaml.safe_load(var))
+    manager.create_folders(out_dir)
+    path = os.path.join(out_dir, 'templates.yaml')
+    temp_path = '{path}.{pid}.tmp'.format(path=path, pid=os.getpid())
+    try:
+        with open(temp_path, 'w') as _fd:
+            events = yaml.parse(GeneratorReader(template_renderer.generate(template_path)), Loader=yaml.SafeLoader)
+            yaml.emit(_safe_mapping_events(events, template_path), _fd)
+        getattr(os, 'replace', os.rename)(temp_path, path)
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+    return path
+
+
+def _worker_stream_template(task):
+    name, template_path, out_dir = task
+    return stream_template(_WORKER_RENDERERS[name], template_path, out_dir)
+
+
+def _worker_render_and_load(task):
+    name, task = task
+    return _render_and_load(_WORKER_RENDERERS[name], task)
+
+
+def _compile_templates(template_paths, cache_dir, loader_factory):
+    """Compile templates with their includes into bytecode cache."""
+    template_renderer = TemplateRenderer({}, create_bytecode_cache(cache_dir), loader_factory)
+    for template_path in template_paths:
+        env = template_renderer.get_environment(os.path.dirname(template_path))
+        if not env.loader.has_source_access:
+            continue  # precompiled templates
+
+        for name, _, _, _ in template_renderer.collect_templates(template_path)[0]:
+            env.get_template(name)
+
+
+def render_matrix(template_paths, contexts, cache_dir=None, jobs=1, render_caches=None,
+                  loader_factory=FileSystemLoader, stream=False, bytecode_cache=None):
+    """
+    Render templates with every variable set and load rendered YAML,
+    in a pool of worker processes if more than one job is allowed.
+    Templates are compiled once and shared between variable sets.
+
+    :param template_paths: list of paths to templates
+    :type template_paths: list
+
+    :param contexts: variable sets by name
+    :type contexts: dict
+
+    :param cache_dir: path to compiled templates cache
+
+    :param jobs: number of worker processes
+    :type jobs: int
+
+    :param render_caches: caches to skip rendering of unchanged templates
+                          by variable set name
+    :type render_caches: dict
+
+    :param loader_factory: callable creating loader for templates directory
+
+    :param stream: feed rendered chunks to YAML loader without keeping whole
+                   output in memory, render caches are not used then
+    :type stream: bool
+
+    :param bytecode_cache: compiled templates cache used instead of cache_dir
+                           when rendering in this process
+
+    :return: loaded templates in the order of template_paths by variable set name
+    :rtype: dict
+    """
+    render_caches = {} if stream else render_caches or {}
+    tasks = []
+    for name, context in contexts.items():
+        render_cache = render_caches.get(name)
+        tasks.extend(
+            (name, (path, render_cache.get(path, context), True, False))
+            if render_cache else (name, (path, None, False, stream))
+            for path in template_paths
+        )
+
+    if jobs < 2 or len(tasks) < 2:
+        renderers = _create_renderers(contexts, cache_dir, loader_factory, bytecode_cache)
+        results = [_render_and_load(renderers[name], task) for name, task in tasks]
+    else:
+        if len(contexts) > 1:
+            # compile before workers start, so they only load compiled code
+            _compile_templates(template_paths, cache_dir, loader_factory)
+
+        pool = multiprocessing.Pool(
+            min(jobs, len(tasks)),
+            _init_worker,
+            (contexts, cache_dir, loader_factory),
+        )
+        try:
+            results = pool.map(_worker_render_and_load, tasks, chunksize=1)
+        finally:
+            pool.terminate()
+            pool.join()
+
+    loaded_templates = {name: [] for name in contexts}
+    for (name, (path, _, _, _)), (loaded, rendered, dependencies) in zip(tasks, results):
+        loaded_templates[name].append(loaded)
+        if rendered is not None and name in render_caches:
+            render_caches[name].set(path, contexts[name], rendered, dependencies)
+
+    return loaded_templates
+
+
+def stream_matrix(template_path, out_dirs, contexts, cache_dir=None, jobs=1,
+                  loader_factory=FileSystemLoader, bytecode_cache=None):
+    """
+    Render single template with every variable set straight to templates.yaml
+    of its output directory, see stream_template. Peak memory doesn't depend
+    on size of template output, nothing is sent back from worker processes.
+
+    :param template_path: path to template
+    :type template_path: str
+
+    :param out_dirs: output directories by variable set name
+    :type out_dirs: dict
+
+    :param contexts: variable sets by name
+    :type contexts: dict
+
+    :param cache_dir: path to compiled templates cache
+
+    :param jobs: number of worker processes
+    :type jobs: int
+
+    :param loader_factory: callable creating loader for templates directory
+
+    :param bytecode_cache: compiled templates cache used instead of cache_dir
+                           when rendering in this process
+
+    :return: written files by variable set name
+    :rtype: dict
+    """
+    tasks = [(name, template_path, out_dirs[name]) for name in contexts]
+
+    if jobs < 2 or len(tasks) < 2:
+        renderers = _create_renderers(contexts, cache_dir, loader_factory, bytecode_cache)
+        results = [stream_template(renderers[name], path, out_dir) for name, path, out_dir in tasks]
+    else:
+        _compile_templates([template_path], cache_dir, loader_factory)
+        pool = multiprocessing.Pool(
+            min(jobs, len(tasks)),
+            _init_worker,
+            (contexts, cache_dir, loader_factory),
+        )
+        try:
+            results = pool.map(_worker_stream_template, tasks, chunksize=1)
+        finally:
+            pool.terminate()
+            pool.join()
+
+    return dict(zip(contexts, results))
+
+
+def render_templates(template_paths, context, cache_dir=None, jobs=1, render_cache=None,
+                     loader_factory=FileSystemLoader, stream=False):
+    """
+    Render templates and load rendered YAML, in a pool of worker processes
+    if more than one job is allowed
+
+    :param template_paths: list of paths to templates
+    :type template_paths: list
+
+    :param context: variables
+    :type context: dict
+
+    :param cache_dir: path to compiled templates cache
+
+    :param jobs: number of worker processes
+    :type jobs: int
+
+    :param render_cache: cache to skip rendering of unchanged templates
+    :type render_cache: RenderCache
+
+    :param loader_factory: callable creating loader for templates directory
+
+    :param stream: feed rendered chunks to YAML loader without keeping whole
+                   output in memory, render cache is not used then
+    :type stream: bool
+
+    :return: loaded templates in the order of template_paths
+    :rtype: list
+    """
+    return render_matrix(
+        template_paths,
+        {None: context},
+        cache_dir=cache_dir,
+        jobs=jobs,
+        render_caches={None: render_cache} if render_cache else None,
+        loader_factory=loader_factory,
+        stream=stream,
+    )[None]
+
+
+MergeConflict = namedtuple('MergeConflict', ['path', 'old', 'new', 'source'])
+
+_MISSING = object()
+
+
+class DeepMerger(object):
+    """
+    Deep merge of layered data structures
+
+    Subtrees which overlays don't touch are shared by reference with the
+    layers, a mapping is copied only on the first write into it. Merging
+    costs time proportional to the overlay sizes, not to the base size.
+    """
+
+    def __init__(self):
+        self.result = {}
+        self.owned = {id(self.result): self.result}
+        self.conflicts = []
+
+    def _own(self, mapping):
+        copy = type(mapping)(mapping)
+        self.owned[id(copy)] = copy
+        return copy
+
+    def _merge(self, target, overlay, path, source):
+        for key, value in overlay.items():
+            current = target.get(key, _MISSING)
+
+            if isinstance(current, dict) and isinstance(value, dict):
+                if id(current) not in self.owned:
+                    current = target[key] = self._own(current)
+                self._merge(current, value, path + (key,), source)
+                continue
+
+            if current is not _MISSING and current != value:
+                self.conflicts.append(
+                    MergeConflict(path + (key,), current, value, source),
+                )
+            target[key] = value
+
+    def merge(self, overlay, source=None):
+        """
+        Merge overlay on top of the result
+
+        :param overlay: data structure to merge
+        :type overlay: dict
+
+        :param source: overlay name to report conflicts
+
+        :return: None
+        """
+        self._merge(self.result, overlay, (), source)
+
+
+def merge(loaded_templates, deep=False, names=None):
+    """
+    Merge loaded templates in order
+
+    :param loaded_templates: list of loaded templates to merge in order
+
+    :param deep: merge nested mappings instead of replacing top level keys
+    :type deep: bool
+
+    :param names: template names to report conflicts
+
+    :return: merged data structure and conflicts found by deep merge
+    :rtype: tuple
+    """
+    if not deep:
+        dict_base = {}
+        for var in loaded_templates:
+            dict_base.update(var)
+        return dict_base, []
+
+    merger = DeepMerger()
+    for var, name in zip(loaded_templates, names or [None] * len(loaded_templates)):
+        merger.merge(var, name)
+    return merger.result, merger.conflicts
+
+
+def merge_templates(rendered_templates, out_dir, deep=False, names=None):
+    """
+    Merge templates and write them to templates.yaml, see merge for
+    templates which are loaded already
+
+    :param rendered_templates: list of templates to merge in order,
+                               rendered YAML text or loaded data structures
+
+    :param out_dir: path to rendered templates
+
+    :param deep: merge nested mappings instead of replacing top level keys
+    :type deep: bool
+
+    :param names: template names to report conflicts
+
+    :return: conflicts found by deep merge
+    :rtype: list
+    """
+    loaded_templates = [
+        var if isinstance(var, dict) else yaml.safe_load(var) for var in rendered_templates
+    ]
+    dict_base, conflicts = merge(loaded_templates, deep=deep, names=names)
 
     manager.create_folders(out_dir)
     with open(os.path.join(out_dir, 'templates.yaml'), 'w') as _fd:
         yaml.dump(dict_base, _fd, default_flow_style=False)
+
+    return conflicts
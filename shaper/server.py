@@ -0,0 +1,157 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""shaper server - long running shaper with warm caches
+
+`shaper serve` listens on unix socket for requests of shaper-client:
+one JSON line with command line arguments and working directory, answered
+with one JSON line with exit status and captured output. Requests are run
+one by one, since commands change working directory of the process.
+
+Parsed files are kept in memory until their mtime or size changes,
+compiled templates until their source changes. Least recently read files
+are dropped when more than WarmCache.MAX_FILES are kept.
+"""
+
+from __future__ import print_function
+
+import json
+import os
+import signal
+import socket
+import stat
+import sys
+from collections import OrderedDict
+
+try:
+    import SocketServer as socketserver
+except ImportError:
+    import socketserver
+
+from . import cli
+from . import libs
+from .client import default_socket_path
+from .renderer import MemoryBytecodeCache
+
+
+class WarmCache(object):
+    """Parsed files and compiled templates shared by server requests."""
+
+    # parsed files kept in memory, long running server reads unbounded number of paths
+    MAX_FILES = 4096
+
+    def __init__(self, max_files=MAX_FILES):
+        self.files = OrderedDict()
+        self.max_files = max_files
+        self.bytecode_cache = MemoryBytecodeCache()
+
+    def read(self, path):
+        """Read file data structure, parse it again only if file changed.
+
+        Returned structure is shared between requests and must not be modified.
+
+        :param path: string path to file
+        :return: File data structure
+        :rtype: [dict, list]
+        """
+
+        path = os.path.abspath(path)
+        try:
+            stat_result = os.stat(path)
+        except OSError:
+            return libs.parser.read(path)  # reports error as without cache
+        signature = (stat_result.st_mtime, stat_result.st_size)
+
+        # reinserted to keep files in order of use
+        entry = self.files.pop(path, None)
+        if entry is None or entry[0] != signature:
+            entry = (signature, libs.parser.read(path))
+        self.files[path] = entry
+
+        while len(self.files) > self.max_files:
+            self.files.popitem(last=False)
+
+        return entry[1]
+
+
+class RequestHandler(socketserver.StreamRequestHandler):
+
+    def handle(self):
+        try:
+            message = json.loads(self.rfile.readline().decode('utf-8'))
+            response = self.server.run(message['argv'], message['cwd'])
+        except (ValueError, KeyError, TypeError) as exc:
+            response = {'status': 2, 'stdout': '', 'stderr': 'Bad request: {}\n'.format(exc)}
+
+        self.wfile.write(json.dumps(response).encode('utf-8') + b'\n')
+
+
+class ShaperServer(socketserver.UnixStreamServer):
+    """Unix socket server running shaper commands with warm caches."""
+
+    def __init__(self, socket_path):
+        self.socket_path = socket_path
+        self.cache = WarmCache()
+        remove_stale_socket(socket_path)
+
+        socketserver.UnixStreamServer.__init__(self, socket_path, RequestHandler)
+
+    def server_bind(self):
+        # commands run with rights of server user, don't let others connect:
+        # socket is created private, there is no moment it is open to others
+        umask = os.umask(0o077)
+        try:
+            socketserver.UnixStreamServer.server_bind(self)
+        finally:
+            os.umask(umask)
+        os.chmod(self.socket_path, stat.S_IRUSR | stat.S_IWUSR)
+
+    def run(self, argv, cwd):
+        """Run shaper command capturing its output.
+
+        :param argv: command line arguments without program name
+        :param cwd: working directory of command
+        :return: response with status, stdout and stderr
+        :rtype: dict
+        """
+
+        return cli.run_captured(argv, self.cache, cwd)
+
+    def server_close(self):
+        socketserver.UnixStreamServer.server_close(self)
+        if os.path.exists(self.socket_path):
+            os.unlink(self.socket_path)
+
+
+def remove_stale_socket(socket_path):
+    """Remove socket left by killed server, fail if server is listening."""
+
+    if not os.path.exists(socket_path):
+        return
+
+    probe = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        probe.connect(socket_path)
+    except socket.error:
+        os.unlink(socket_path)
+    else:
+        raise OSError('Server is already listening on {path}'.format(path=socket_path))
+    finally:
+        probe.close()
+
+
+def serve(socket_path=None):
+    """Serve requests until interrupted.
+
+    :param socket_path: path to unix socket, default_socket_path() if None
+    """
+
+    server = ShaperServer(socket_path or default_socket_path())
+    sys.stderr.write('Listening on {path}\n'.format(path=server.socket_path))
+    # remove socket on termination as well
+    signal.signal(signal.SIGTERM, signal.default_int_handler)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
@@ -0,0 +1,294 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""shaper snapshot - binary snapshot of parsed datastructure
+
+Parsing big YAML dominates `write` when DSL didn't change, so parsed tree
+is saved next to DSL (`.out.yml.snapshot`) and used while SHA-1 of DSL
+matches one in snapshot. Snapshot is memory mapped and decoded lazily:
+mappings above files are walked without decoding subtrees not asked for,
+file data structures are decoded whole, as parsers expect them.
+
+Layout, little endian:
+
+    header   magic, SHA-1 of DSL, offset of string table, offset of root
+    values   tag byte and payload, children are written before parents
+               N None, T True, F False, I int64, D double, S string index,
+               L count and offsets of items,
+               M count and offsets of key and value pairs
+    strings  count, offsets of strings, strings as length and UTF-8 bytes
+
+Every distinct string is stored once, values shared by YAML aliases too.
+DSL with values of other types (dates, big integers...) is not snapshotted.
+"""
+
+import hashlib
+import mmap
+import os
+import struct
+from collections import OrderedDict
+
+try:
+    from collections.abc import Mapping
+except ImportError:
+    from collections import Mapping
+
+from . import libs
+from . import profiler
+
+MAGIC = b'SHSNAP1\x00'
+HEADER = struct.Struct('<8s20sQQ')
+COUNT = struct.Struct('<I')
+OFFSET = struct.Struct('<Q')
+PAIR = struct.Struct('<QQ')
+INT = struct.Struct('<q')
+DOUBLE = struct.Struct('<d')
+
+INT_RANGE = (-2 ** 63, 2 ** 63 - 1)
+
+try:
+    STRING_TYPES = (str, unicode)  # pylint: disable=undefined-variable
+except NameError:
+    STRING_TYPES = (str,)
+
+
+class UnsupportedValue(TypeError):
+    """Value can't be stored in snapshot."""
+
+
+def snapshot_path(path):
+    """Path to snapshot of DSL file."""
+
+    directory, filename = os.path.split(path)
+    return os.path.join(directory, '.{filename}.snapshot'.format(filename=filename))
+
+
+def hash_file(path):
+    digest = hashlib.sha1()
+    with open(path, 'rb') as _fd:
+        for chunk in iter(lambda: _fd.read(1024 * 1024), b''):
+            digest.update(chunk)
+    return digest.digest()
+
+
+class Builder(object):
+    """Encode data structure to snapshot."""
+
+    def __init__(self):
+        self.buffer = bytearray(HEADER.size)
+        self.strings = []
+        self.string_index = {}
+        self.offsets = {}  # by id of containers, for values shared by aliases
+
+    def intern(self, string):
+        index = self.string_index.get(string)
+        if index is None:
+            index = self.string_index[string] = len(self.strings)
+            self.strings.append(string)
+        return index
+
+    def add(self, value):
+        """Encode value, return its offset."""
+
+        if isinstance(value, (dict, list)):
+            offset = self.offsets.get(id(value))
+            if offset is not None:
+                return offset
+
+        if isinstance(value, dict):
+            pairs = [(self.add(key), self.add(item)) for key, item in value.items()]
+            record = b'M' + COUNT.pack(len(pairs)) + b''.join(PAIR.pack(*pair) for pair in pairs)
+        elif isinstance(value, list):
+            items = [self.add(item) for item in value]
+            record = b'L' + COUNT.pack(len(items)) + b''.join(OFFSET.pack(item) for item in items)
+        elif value is None:
+            record = b'N'
+        elif value is True:
+            record = b'T'
+        elif value is False:
+            record = b'F'
+        elif isinstance(value, int) and INT_RANGE[0] <= value <= INT_RANGE[1]:
+            record = b'I' + INT.pack(value)
+        elif isinstance(value, float):
+            record = b'D' + DOUBLE.pack(value)
+        elif isinstance(value, STRING_TYPES):
+            record = b'S' + COUNT.pack(self.intern(value))
+        else:
+            raise UnsupportedValue('{type} values are not supported'.format(type=type(value).__name__))
+
+        offset = len(self.buffer)
+        self.buffer.extend(record)
+        if isinstance(value, (dict, list)):
+            self.offsets[id(value)] = offset
+        return offset
+
+    def build(self, data, source_hash):
+        """Encode data structure of DSL with given SHA-1 digest.
+
+        :rtype: bytes
+        """
+
+        root = self.add(data)
+
+        strings_offset = len(self.buffer)
+        encoded = [string.encode('utf-8') for string in self.strings]
+        self.buffer.extend(COUNT.pack(len(encoded)))
+        position = len(self.buffer) + OFFSET.size * len(encoded)
+        for string in encoded:
+            self.buffer.extend(OFFSET.pack(position))
+            position += COUNT.size + len(string)
+        for string in encoded:
+            self.buffer.extend(COUNT.pack(len(string)))
+            self.buffer.extend(string)
+
+        self.buffer[:HEADER.size] = HEADER.pack(MAGIC, source_hash, strings_offset, root)
+        return bytes(self.buffer)
+
+
+class Snapshot(object):
+    """Memory mapped snapshot."""
+
+    def __init__(self, buffer):
+        self.buffer = buffer
+        _, self.source_hash, strings_offset, self.root_offset = HEADER.unpack_from(buffer, 0)
+        self.strings_offset = strings_offset + COUNT.size
+        self.strings = [None] * COUNT.unpack_from(buffer, strings_offset)[0]
+
+    @classmethod
+    def open(cls, path):
+        """Map snapshot file, None if it is not snapshot."""
+
+        with open(path, 'rb') as _fd:
+            if _fd.read(len(MAGIC)) != MAGIC:
+                return None
+            buffer = mmap.mmap(_fd.fileno(), 0, access=mmap.ACCESS_READ)
+        return cls(buffer)
+
+    def string(self, index):
+        string = self.strings[index]
+        if string is None:
+            offset = OFFSET.unpack_from(self.buffer, self.strings_offset + OFFSET.size * index)[0]
+            length = COUNT.unpack_from(self.buffer, offset)[0]
+            start = offset + COUNT.size
+            string = self.strings[index] = self.buffer[start:start + length].decode('utf-8')
+        return string
+
+    def tag(self, offset):
+        return self.buffer[offset:offset + 1]
+
+    def pairs(self, offset):
+        count = COUNT.unpack_from(self.buffer, offset + 1)[0]
+        start = offset + 1 + COUNT.size
+        return [PAIR.unpack_from(self.buffer, start + PAIR.size * number) for number in range(count)]
+
+    def decode(self, offset):
+        """Decode value with all its children."""
+
+        tag = self.tag(offset)
+        if tag == b'S':
+            return self.string(COUNT.unpack_from(self.buffer, offset + 1)[0])
+        if tag == b'M':
+            return OrderedDict(
+                (self.decode(key), self.decode(value)) for key, value in self.pairs(offset)
+            )
+        if tag == b'L':
+            count = COUNT.unpack_from(self.buffer, offset + 1)[0]
+            start = offset + 1 + COUNT.size
+            return [
+                self.decode(OFFSET.unpack_from(self.buffer, start + OFFSET.size * number)[0])
+                for number in range(count)
+            ]
+        if tag == b'I':
+            return INT.unpack_from(self.buffer, offset + 1)[0]
+        if tag == b'D':
+            return DOUBLE.unpack_from(self.buffer, offset + 1)[0]
+        return {b'N': None, b'T': True, b'F': False}[tag]
+
+    def node(self, offset, path):
+        """Lazy mapping for directories of tree, decoded value for files."""
+
+        if self.tag(offset) == b'M' and '.' not in path:
+            return SnapshotMapping(self, offset, path)
+        return self.decode(offset)
+
+    def root(self):
+        return self.node(self.root_offset, '')
+
+
+class SnapshotMapping(Mapping):
+    """Directory of tree in snapshot, children are decoded on access."""
+
+    def __init__(self, snapshot, offset, path):
+        self.snapshot = snapshot
+        self.offset = offset
+        self.path = path
+        self._entries = None
+
+    def entries(self):
+        if self._entries is None:
+            self._entries = OrderedDict(
+                (self.snapshot.decode(key), value) for key, value in self.snapshot.pairs(self.offset)
+            )
+        return self._entries
+
+    def child(self, key, offset):
+        path = '{}/{}'.format(self.path, key) if self.path else str(key)
+        return self.snapshot.node(offset, path)
+
+    def __getitem__(self, key):
+        return self.child(key, self.entries()[key])
+
+    def __iter__(self):
+        return iter(self.entries())
+
+    def __len__(self):
+        return len(self.entries())
+
+    def items(self):
+        return [(key, self.child(key, offset)) for key, offset in self.entries().items()]
+
+
+def save(data, path, source_hash):
+    """Write snapshot of data structure, quietly skip unsupported data or unwritable directory."""
+
+    try:
+        content = Builder().build(data, source_hash)
+    except UnsupportedValue:
+        return False
+
+    temp_path = '{path}.{pid}.tmp'.format(path=path, pid=os.getpid())
+    try:
+        with open(temp_path, 'wb') as _fd:
+            _fd.write(content)
+        getattr(os, 'replace', os.rename)(temp_path, path)
+    except (OSError, IOError):
+        return False
+    return True
+
+
+def read(path):
+    """
+    Read DSL from snapshot if it is up to date, parse it and save snapshot otherwise
+
+    :param path: path to DSL
+    :return: data structure, lazy in directories if read from snapshot
+    """
+    source_hash = hash_file(path)
+    cached_path = snapshot_path(path)
+
+    try:
+        snapshot = Snapshot.open(cached_path)
+    except (OSError, IOError, ValueError, struct.error):
+        snapshot = None
+
+    if snapshot is not None and snapshot.source_hash == source_hash:
+        if profiler.ACTIVE is not None:
+            # DSL isn't parsed, so it's counted apart from parsed files
+            ext = os.path.splitext(path)[1]
+            profiler.count('snapshots_read', ext)
+            profiler.count('snapshot_bytes_read', ext, os.path.getsize(cached_path))
+        return snapshot.root()
+
+    data = libs.parser.read(path)
+    if data is not None:
+        save(data, cached_path, source_hash)
+    return data
@@ -0,0 +1,367 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""shaper sources - external variable sources (CMDB) for playbooks
+
+Sources are declared in the playbook:
+
+    sources:
+      cmdb:
+        type: sqlite
+        path: cmdb.db
+      inventory:
+        type: http
+        url: http://cmdb.example.com/api/values
+
+and read from templates with `{{ lookup('cmdb', 'spring.redis.host') }}`.
+Lookups with constant arguments are collected from templates and fetched
+in batches before rendering, batches of one source concurrently over up to
+`pool_size` connections. All values are memoized for the run.
+"""
+
+import json
+import os
+import sqlite3
+import threading
+from abc import ABCMeta, abstractmethod
+from contextlib import contextmanager
+
+try:
+    import Queue as queue
+except ImportError:
+    import queue
+
+try:
+    from urlparse import urlparse
+except ImportError:
+    from urllib.parse import urlparse
+
+try:
+    import httplib
+except ImportError:
+    import http.client as httplib
+
+from jinja2 import nodes
+
+from . import libs
+from .renderer import LOOKUP, TemplateRenderer, is_constant_lookup
+
+
+class ConnectionPool(object):
+    """Pool of at most `size` connections created by `factory` on demand."""
+
+    def __init__(self, factory, size):
+        self.factory = factory
+        self.size = size
+        self.created = 0
+        self.idle = queue.LifoQueue()
+        self.lock = threading.Lock()
+
+    @contextmanager
+    def connection(self):
+        """Borrow connection, wait for idle one if pool is exhausted."""
+
+        try:
+            conn = self.idle.get_nowait()
+        except queue.Empty:
+            with self.lock:
+                create = self.created < self.size
+                if create:
+                    self.created += 1
+            conn = self.factory() if create else self.idle.get()
+
+        try:
+            yield conn
+        finally:
+            self.idle.put(conn)
+
+
+# base class with ABCMeta for python 2 and 3
+_Abstract = ABCMeta(str('_Abstract'), (object,), {})
+
+
+class BaseSource(_Abstract):
+    """Source of variables fetched by keys in batches over pooled connections."""
+
+    BATCH_SIZE = 500
+
+    def __init__(self, pool_size=4, batch_size=None):
+        self.pool_size = pool_size
+        self.batch_size = batch_size or self.BATCH_SIZE
+        self._pool = None
+
+    def __getstate__(self):
+        # connections are not shared with worker processes, they open their own
+        state = self.__dict__.copy()
+        state['_pool'] = None
+        return state
+
+    @property
+    def pool(self):
+        if self._pool is None:
+            self._pool = ConnectionPool(self.connect, self.pool_size)
+        return self._pool
+
+    @abstractmethod
+    def connect(self):
+        """Open new connection to the source, used by one thread at a time."""
+
+    @abstractmethod
+    def fetch(self, connection, keys):
+        """Fetch values of keys in one round trip.
+
+        :param connection: connection from pool
+        :param keys: list of keys
+        :return: values by key, missing keys are absent
+        :rtype: dict
+        """
+
+    def get_many(self, keys):
+        """Fetch values of keys in batches, concurrently by a thread
+        per pooled connection if there is more than one batch.
+
+        :param keys: list of keys
+        :return: values by key, missing keys are absent
+        :rtype: dict
+        """
+
+        batches = queue.Queue()
+        for start in range(0, len(keys), self.batch_size):
+            batches.put(keys[start:start + self.batch_size])
+
+        values = {}
+        errors = []
+        lock = threading.Lock()
+
+        def fetch_batches():
+            while not errors:
+                try:
+                    batch = batches.get_nowait()
+                except queue.Empty:
+                    return
+
+                try:
+                    with self.pool.connection() as connection:
+                        fetched = self.fetch(connection, batch)
+                # pylint: disable=broad-except
+                # error is raised again in calling thread
+                except Exception as exc:
+                    errors.append(exc)
+                    return
+
+                with lock:
+                    values.update(fetched)
+
+        threads = [
+            threading.Thread(target=fetch_batches)
+            for _ in range(min(self.pool_size, batches.qsize()) - 1)
+        ]
+        for thread in threads:
+            thread.start()
+        fetch_batches()  # calling thread fetches too
+        for thread in threads:
+            thread.join()
+
+        if errors:
+            raise errors[0]
+        return values
+
+
+class StaticSource(BaseSource):
+    """Values from playbook or YAML/JSON file, local stand-in for CMDB."""
+
+    def __init__(self, values=None, path=None, **kwargs):
+        super(StaticSource, self).__init__(**kwargs)
+        self.values = dict(values or {})
+        if path:
+            self.values.update(libs.parser.read(path) or {})
+
+    def connect(self):
+        return self.values
+
+    def fetch(self, connection, keys):
+        return {key: connection[key] for key in keys if key in connection}
+
+
+class SQLiteSource(BaseSource):
+    """Key-value table in SQLite database, values may be JSON encoded."""
+
+    BATCH_SIZE = 500  # SQLite allows 999 parameters per query
+
+    def __init__(self, path, table='variables', key_column='key', value_column='value', **kwargs):
+        super(SQLiteSource, self).__init__(**kwargs)
+        self.path = path
+        self.query = 'SELECT {key}, {value} FROM {table} WHERE {key} IN ({{params}})'.format(
+            key=self.quote(key_column),
+            value=self.quote(value_column),
+            table=self.quote(table),
+        )
+
+    @staticmethod
+    def quote(identifier):
+        return '"{}"'.format(identifier.replace('"', '""'))
+
+    @staticmethod
+    def decode(value):
+        try:
+            return json.loads(value)
+        except (TypeError, ValueError):
+            return value
+
+    def connect(self):
+        return sqlite3.connect(self.path, check_same_thread=False)
+
+    def fetch(self, connection, keys):
+        cursor = connection.execute(
+            self.query.format(params=', '.join('?' * len(keys))),
+            keys,
+        )
+        return {key: self.decode(value) for key, value in cursor}
+
+
+class HTTPSource(BaseSource):
+    """HTTP key-value store: POST JSON list of keys, get JSON object back."""
+
+    def __init__(self, url, timeout=30, headers=None, **kwargs):
+        super(HTTPSource, self).__init__(**kwargs)
+        self.url = urlparse(url)
+        self.timeout = timeout
+        self.headers = {'Content-Type': 'application/json'}
+        self.headers.update(headers or {})
+
+    def connect(self):
+        connection_class = httplib.HTTPSConnection if self.url.scheme == 'https' else httplib.HTTPConnection
+        return connection_class(self.url.netloc, timeout=self.timeout)
+
+    def fetch(self, connection, keys):
+        path = self.url.path or '/'
+        if self.url.query:
+            path = '{}?{}'.format(path, self.url.query)
+
+        try:
+            connection.request('POST', path, json.dumps(keys), self.headers)
+            response = connection.getresponse()
+            body = response.read()
+        except (httplib.HTTPException, OSError, IOError):
+            connection.close()  # reconnects on next request
+            raise
+
+        if response.status != 200:
+            raise IOError('{url} responded {status} {reason}'.format(
+                url=self.url.geturl(), status=response.status, reason=response.reason,
+            ))
+
+        return json.loads(body.decode('utf-8'))
+
+
+SOURCES_MAPPING = {
+    'static': StaticSource,
+    'sqlite': SQLiteSource,
+    'http': HTTPSource,
+}
+
+
+def find_lookups(ast):
+    """Find lookup calls with constant arguments in template AST.
+
+    :param ast: template AST
+    :return: generator of (source, key)
+    """
+
+    for call in ast.find_all(nodes.Call):
+        if is_constant_lookup(call):
+            yield call.args[0].value, call.args[1].value
+
+
+class VariableSources(object):
+    """Lookup function for templates, memoizes values for the run."""
+
+    def __init__(self, sources):
+        self.sources = sources
+        self.values = {name: {} for name in sources}
+        self.fetched = {name: set() for name in sources}
+        self.prefetched = repr([])
+
+    def __call__(self, source, key, default=None):
+        if source not in self.sources:
+            raise ValueError('Unknown variable source {source!r}, playbook declares: {declared}'.format(
+                source=source, declared=', '.join(sorted(self.sources)) or 'none',
+            ))
+
+        if key not in self.fetched[source]:
+            self.fetch(source, [key])
+
+        return self.values[source].get(key, default)
+
+    def __repr__(self):
+        # variables hash of incremental play depends on prefetched values only,
+        # values fetched while rendering differ between processes and runs;
+        # templates with such lookups are not cached, see find_dependencies
+        return self.prefetched
+
+    def fetch(self, source, keys):
+        """Fetch values of keys not fetched yet in batches.
+
+        :param source: source name
+        :param keys: list of keys
+        """
+
+        keys = [key for key in set(keys) if key not in self.fetched[source]]
+        if keys:
+            self.values[source].update(self.sources[source].get_many(keys))
+            self.fetched[source].update(keys)
+
+    def prefetch(self, template_paths, loader_factory):
+        """Fetch values of lookups with constant arguments in templates.
+
+        :param template_paths: list of paths to templates
+        :param loader_factory: callable creating loader for templates directory
+        """
+
+        template_renderer = TemplateRenderer({}, loader_factory=loader_factory)
+        keys = {name: set() for name in self.sources}
+
+        for template_path in template_paths:
+            env = template_renderer.get_environment(os.path.dirname(template_path))
+            if not env.loader.has_source_access:
+                continue  # precompiled templates
+
+            for _, _, _, ast in template_renderer.collect_templates(template_path)[0]:
+                for source, key in find_lookups(ast):
+                    if source in keys:
+                        keys[source].add(key)
+
+        for source, source_keys in keys.items():
+            self.fetch(source, list(source_keys))
+
+        self.prefetched = repr(sorted(
+            (name, sorted(values.items(), key=repr)) for name, values in self.values.items()
+        ))
+
+
+def from_playbook(playbook, base_dir):
+    """Create variable sources declared in playbook.
+
+    :param playbook: playbook data structure
+    :param base_dir: directory relative source paths are resolved from
+    :return: lookup function or None if playbook has no sources
+    :rtype: VariableSources
+    """
+
+    declared = playbook.get('sources')
+    if not declared:
+        return None
+
+    sources = {}
+    for name, options in declared.items():
+        options = dict(options)
+        source_type = options.pop('type', 'static')
+        if source_type not in SOURCES_MAPPING:
+            raise ValueError('Unknown type {type!r} of variable source {name!r}, supported: {supported}'.format(
+                type=source_type, name=name, supported=', '.join(sorted(SOURCES_MAPPING)),
+            ))
+        source_class = SOURCES_MAPPING[source_type]
+        if options.get('path'):
+            options['path'] = os.path.join(base_dir, options['path'])
+        sources[name] = source_class(**options)
+
+    return VariableSources(sources)
@@ -0,0 +1,131 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""shaper split - datastructure split into YAML shards with index
+
+Tree is split at its first level having more than one key, usually
+services of a project: paths above it are kept in index as prefix.
+Every shard is complete datastructure with one subtree, so it can be
+written alone, and `load` merges back only shards selected by keys.
+
+    index.yml:
+      version: 1
+      prefix: [myproject]
+      shards:
+        my-backend: my-backend.yml
+        my-frontend: my-frontend.yml
+"""
+
+import multiprocessing
+import os
+import re
+from collections import OrderedDict
+
+from . import libs
+from . import manager
+
+INDEX = 'index.yml'
+VERSION = 1
+
+
+def is_split(path):
+    """Whether path is directory with split datastructure."""
+
+    return os.path.isfile(os.path.join(path, INDEX))
+
+
+def find_prefix(tree):
+    """Path to first level of tree having more than one key or a file."""
+
+    prefix = []
+    node = tree
+    while len(node) == 1:
+        key, value = next(iter(node.items()))
+        if '.' in '/'.join(prefix + [key]) or not isinstance(value, dict):
+            break
+        prefix.append(key)
+        node = value
+
+    return prefix, node
+
+
+def nest(prefix, key, value):
+    tree = {key: value}
+    for segment in reversed(prefix):
+        tree = {segment: tree}
+    return tree
+
+
+def write_split(tree, out_dir):
+    """
+    Write tree as shards and index
+
+    :param tree: nested data structure, as forward_path_parser makes it
+    :param out_dir: path to shards directory
+    :return: index
+    :rtype: dict
+    """
+    manager.create_folders(out_dir)
+    prefix, node = find_prefix(tree)
+
+    shards = OrderedDict()
+    used = set([INDEX])
+    for key in sorted(node, key=str):
+        filename = re.sub(r'[^\w.-]', '_', str(key)) + '.yml'
+        number = 1
+        while filename.lower() in used:
+            number += 1
+            filename = '{}-{}.yml'.format(re.sub(r'[^\w.-]', '_', str(key)), number)
+        used.add(filename.lower())
+
+        libs.parser.write(nest(prefix, key, node[key]), os.path.join(out_dir, filename))
+        shards[key] = filename
+
+    index = OrderedDict([('version', VERSION), ('prefix', prefix), ('shards', shards)])
+    # index last, directory is not split datastructure until it is complete
+    libs.parser.write(index, os.path.join(out_dir, INDEX))
+    return index
+
+
+def select_shards(index, keys=None):
+    """Shard file names which may contain files matching keys, all without keys."""
+
+    if not keys:
+        return list(index['shards'].values())
+
+    patterns = manager.KeyPatterns(keys)
+    return [
+        filename for key, filename in index['shards'].items()
+        if patterns.may_match(list(index['prefix']) + [str(key)])
+    ]
+
+
+def load_split(path, keys=None, jobs=1, reader=None):
+    """
+    Load shards which may contain files matching keys and merge them
+
+    :param path: path to shards directory
+    :param keys: path patterns, as for manager.select_paths
+    :param jobs: number of processes loading shards
+    :param reader: function reading shard, libs.parser.read in parallel if None
+    :return: nested data structure
+    :rtype: dict
+    """
+    index = libs.parser.read(os.path.join(path, INDEX))
+    if not index or index.get('version') != VERSION:
+        raise ValueError('{path} has no index of supported version'.format(path=path))
+
+    paths = [os.path.join(path, filename) for filename in select_shards(index, keys)]
+    if reader is not None or jobs < 2 or len(paths) < 2:
+        shards = [(reader or libs.parser.read)(shard_path) for shard_path in paths]
+    else:
+        pool = multiprocessing.Pool(min(jobs, len(paths)))
+        try:
+            shards = pool.map(libs.parser.read, paths)
+        finally:
+            pool.close()
+            pool.join()
+
+    if any(shard is None for shard in shards):
+        return None  # parse error is reported by parser
+
+    return manager.merge_trees(shards)
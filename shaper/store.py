@@ -0,0 +1,216 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""shaper store - properties of configuration files in SQLite
+
+Every leaf value of every file read by `read` is a row of `properties`
+with path of the file, dotted key and value as JSON, so values are queried
+by indexed key and value without loading whole datastructure. Files keep
+mtime and size they were read with, update parses only changed files.
+
+    files       id, path, mtime, size
+    properties  file_id, position, key_path (JSON list), key, value (JSON)
+
+File which is not mapping (txt) is one row with empty key. Values JSON
+can't express (dates) are stored as strings.
+"""
+
+import json
+import os
+import sqlite3
+from collections import OrderedDict
+
+from . import libs
+from . import manager
+from .diff import flatten_keys
+from .profiler import phase
+
+VERSION = 1
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS files (
+    id INTEGER PRIMARY KEY,
+    path TEXT NOT NULL UNIQUE,
+    mtime REAL NOT NULL,
+    size INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS properties (
+    file_id INTEGER NOT NULL REFERENCES files (id) ON DELETE CASCADE,
+    position INTEGER NOT NULL,
+    key_path TEXT NOT NULL,
+    key TEXT NOT NULL,
+    value TEXT NOT NULL,
+    PRIMARY KEY (file_id, position)
+);
+CREATE INDEX IF NOT EXISTS properties_key_value ON properties (key, value);
+"""
+
+
+def connect(path):
+    """
+    Open store, create it if it doesn't exist
+
+    :param path: path to SQLite database
+    :rtype: sqlite3.Connection
+    """
+    connection = sqlite3.connect(path)
+    connection.execute('PRAGMA foreign_keys = ON')
+
+    version = connection.execute('PRAGMA user_version').fetchone()[0]
+    if version not in (0, VERSION):
+        connection.close()
+        raise ValueError('{path} is store of unsupported version {version}'.format(path=path, version=version))
+
+    with connection:
+        connection.executescript(SCHEMA)
+        connection.execute('PRAGMA user_version = {version}'.format(version=VERSION))
+    return connection
+
+
+def to_rows(data):
+    """Rows (position, key path, key, value) of file data structure."""
+
+    if isinstance(data, dict) and data:
+        flat = flatten_keys(data)
+    else:
+        flat = OrderedDict([((), data)])
+
+    return [
+        (
+            position,
+            json.dumps(list(key)),
+            '.'.join(str(part) for part in key),
+            json.dumps(value, default=str),
+        )
+        for position, (key, value) in enumerate(flat.items())
+    ]
+
+
+def from_rows(rows):
+    """File data structure from (key path, value) rows ordered by position."""
+
+    data = OrderedDict()
+    for key_path, value in rows:
+        key_path = json.loads(key_path)
+        value = json.loads(value, object_pairs_hook=OrderedDict)
+        if not key_path:
+            return value
+
+        node = data
+        for key in key_path[:-1]:
+            node = node.setdefault(key, OrderedDict())
+        node[key_path[-1]] = value
+    return data
+
+
+def update(connection, src_path, reader=None, shard=None):
+    """
+    Store properties of files in directory, parse only files changed since last update
+
+    :param connection: store connection
+    :param src_path: path to properties directory, as given to read
+    :param reader: function reading file, libs.parser.read if None
+    :param shard: (index, count) to update only files of one shard
+    :return: number of parsed files and number of removed files
+    :rtype: tuple
+    """
+    reader = reader or libs.parser.read
+    with phase('walk_on_path'):
+        filenames = list(manager.walk_on_path(src_path))
+
+    def in_shard(filename):
+        return shard is None or manager.shard_of(filename, src_path, shard[1]) == shard[0]
+
+    prefix = os.path.join(src_path, '')
+    stored = {
+        path: (file_id, mtime, size) for file_id, path, mtime, size in connection.execute(
+            'SELECT id, path, mtime, size FROM files WHERE substr(path, 1, ?) = ?',
+            (len(prefix), prefix),
+        )
+        if in_shard(path)
+    }
+
+    parsed = 0
+    with connection, phase('store_update'):
+        for filename in filenames:
+            if not in_shard(filename):
+                continue
+
+            stat = os.stat(filename)
+            known = stored.pop(filename, None)
+            if known is not None and known[1:] == (stat.st_mtime, stat.st_size):
+                continue
+
+            if known is not None:
+                connection.execute('DELETE FROM files WHERE id = ?', (known[0],))
+
+            parsed += 1
+            data = reader(filename)
+            if not data:
+                continue  # read skips empty and broken files too
+
+            file_id = connection.execute(
+                'INSERT INTO files (path, mtime, size) VALUES (?, ?, ?)',
+                (filename, stat.st_mtime, stat.st_size),
+            ).lastrowid
+            connection.executemany(
+                'INSERT INTO properties (file_id, position, key_path, key, value) VALUES (?, ?, ?, ?, ?)',
+                [(file_id,) + row for row in to_rows(data)],
+            )
+
+        # files removed from directory
+        connection.executemany('DELETE FROM files WHERE id = ?', [(known[0],) for known in stored.values()])
+
+    return parsed, len(stored)
+
+
+def load(connection, keys=None):
+    """
+    Files data structures of store, decode only files matching keys
+
+    :param connection: store connection
+    :param keys: path patterns, as for manager.select_paths
+    :return: files data structures by path, as backward_path_parser makes them
+    :rtype: OrderedDict
+    """
+    with phase('store_load'):
+        # paths are built and selected on tree of file ids as on datastructure,
+        # properties are read only for selected files
+        tree = manager.forward_path_parser(dict(connection.execute('SELECT path, id FROM files')))
+        if keys:
+            files = manager.select_paths(tree, keys)
+        else:
+            files = manager.backward_path_parser(tree)
+
+        output = OrderedDict()
+        for path, file_id in sorted(files.items()):
+            output[path] = from_rows(connection.execute(
+                'SELECT key_path, value FROM properties WHERE file_id = ? ORDER BY position',
+                (file_id,),
+            ))
+    return output
+
+
+def query(connection, key, value=None):
+    """
+    Properties with key, optionally only with value
+
+    :param connection: store connection
+    :param key: dotted key, may be glob
+    :param value: value as JSON or as plain string
+    :return: list of (path, key, value as JSON)
+    :rtype: list
+    """
+    operator = 'GLOB' if any(char in key for char in manager.KeyPatterns.GLOB_CHARS) else '='
+    sql = (
+        'SELECT files.path, properties.key, properties.value FROM properties '
+        'JOIN files ON files.id = properties.file_id WHERE properties.key {operator} ?'
+    ).format(operator=operator)
+    parameters = [key]
+
+    if value is not None:
+        # 6379 matches both number and string, "x" and x match string x
+        sql += ' AND properties.value IN (?, ?)'
+        parameters.extend([value, json.dumps(value)])
+
+    with phase('store_query'):
+        return connection.execute(sql + ' ORDER BY files.path, properties.position', parameters).fetchall()
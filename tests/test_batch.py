@@ -0,0 +1,98 @@
+import os
+import sys
+from collections import OrderedDict
+
+import pytest
+
+from shaper import batch, libs
+
+
+@pytest.mark.parametrize('processes', [1, 2])
+def test_run_jobs(tmpdir, processes):
+    tmpdir.join('dsl.yml').write('service:\n  application.properties:\n    db.host: localhost\n')
+    tmpdir.join('jobs.yml').write(
+        'jobs:\n'
+        '  - name: write\n'
+        '    run: write {dir}/dsl.yml -o {dir}/out\n'
+        '  - name: diff\n'
+        '    run: [diff, {dir}/dsl.yml, {dir}/out]\n'
+        '    needs: [write]\n'
+        '  - name: broken\n'
+        '    run: write\n'
+        '  - write {dir}/dsl.yml -o {dir}/independent\n'
+        '  - name: after-broken\n'
+        '    run: write {dir}/dsl.yml -o {dir}/skipped\n'
+        '    needs: [broken]\n'.format(dir=tmpdir),
+    )
+
+    jobs = batch.load_jobs(str(tmpdir.join('jobs.yml')))
+    results = batch.run_jobs(jobs, processes)
+
+    assert list(results) == ['write', 'diff', 'broken', '3', 'after-broken']
+    assert [response['status'] for response in results.values()] == [0, 0, 2, 0, batch.SKIPPED]
+    assert 'src_structure' in results['broken']['stderr']
+    assert libs.parser.read(str(tmpdir.join('independent', 'service', 'application.properties'))) == {
+        'db.host': 'localhost',
+    }
+    assert not tmpdir.join('skipped').exists()
+
+
+def test_load_jobs_unknown_need(tmpdir):
+    tmpdir.join('jobs.yml').write('- run: read .\n  needs: [missing]\n')
+
+    with pytest.raises(ValueError):
+        batch.load_jobs(str(tmpdir.join('jobs.yml')))
+
+
+def test_batch_with_cycle_runs_nothing(tmpdir, capsys):
+    tmpdir.join('dsl.yml').write('service:\n  application.properties:\n    db.host: localhost\n')
+    tmpdir.join('jobs.yml').write(
+        '- name: a\n'
+        '  run: write {dir}/dsl.yml -o {dir}/out\n'
+        '- name: b\n'
+        '  run: read {dir}/out -o {dir}/b.yml\n'
+        '  needs: [a, c]\n'
+        '- name: c\n'
+        '  run: read {dir}/out -o {dir}/c.yml\n'
+        '  needs: [b]\n'.format(dir=tmpdir),
+    )
+
+    arguments = batch.cli.construct_parser().parse_args(['batch', str(tmpdir.join('jobs.yml'))])
+    with pytest.raises(SystemExit) as exc_info:
+        batch.cli.batch(arguments)
+
+    assert exc_info.value.code == 2
+    assert capsys.readouterr().err == 'Jobs need each other: b -> c -> b\n'
+    assert not tmpdir.join('out').exists()
+
+
+def test_run_jobs_survives_failing_workers(tmpdir, monkeypatch):
+    run_captured = batch.cli.run_captured
+
+    def failing_run_captured(argv, cache=None, cwd=None):
+        if argv[0] == 'die':
+            os._exit(1)
+        if argv[0] == 'raise':
+            raise RuntimeError('outside of run_captured')
+        return run_captured(argv, cache, cwd)
+
+    # workers are forked, they run patched function
+    monkeypatch.setattr(batch.cli, 'run_captured', failing_run_captured)
+    monkeypatch.setattr(batch, 'WATCH_INTERVAL', 0.1)
+    tmpdir.join('dsl.yml').write('service:\n  application.properties:\n    db.host: localhost\n')
+    jobs = OrderedDict([
+        ('die', batch.Job('die', ['die'])),
+        ('after-die', batch.Job('after-die', ['write', str(tmpdir.join('dsl.yml'))], ['die'])),
+        ('write', batch.Job('write', ['write', str(tmpdir.join('dsl.yml')), '-o', str(tmpdir.join('out'))])),
+    ])
+    if sys.version_info[0] > 2:
+        jobs['raise'] = batch.Job('raise', ['raise'])
+
+    results = batch.run_jobs(jobs, 2)
+
+    assert results['die']['status'] == 1
+    assert results['after-die']['status'] == batch.SKIPPED
+    assert results['write']['status'] == 0
+    if sys.version_info[0] > 2:
+        assert results['raise']['status'] == 1
+        assert 'outside of run_captured' in results['raise']['stderr']
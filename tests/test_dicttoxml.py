@@ -0,0 +1,33 @@
+from collections import OrderedDict
+
+from shaper.libs import dicttoxml
+
+
+def test_ids_are_reproducible():
+    data = OrderedDict(
+        [
+            ('service', OrderedDict([('host', 'localhost'), ('port', 8080)])),
+            ('users', ['admin', 'guest']),
+        ],
+    )
+
+    first = dicttoxml.dict_to_xml(data, ids=True)
+    second = dicttoxml.dict_to_xml(data, ids=True)
+
+    assert first == second
+    assert b'<service id="root_1" type="dict">' in first
+    assert b'<host id="service_2" type="str">localhost</host>' in first
+
+
+def test_ids_are_unique():
+    data = OrderedDict(
+        [
+            ('a', OrderedDict([('b', 'x'), ('c', ['y', 'z'])])),
+            ('d', ['w', 'v']),
+        ],
+    )
+
+    output = dicttoxml.dict_to_xml(data, ids=True).decode('utf-8')
+    ids = [chunk.split('"')[0] for chunk in output.split(' id="')[1:]]
+
+    assert len(ids) == len(set(ids))
@@ -0,0 +1,42 @@
+from collections import OrderedDict
+
+from shaper import diff, manager, profiler
+
+
+def test_diff_reports_only_drift(tmpdir):
+    datastructure = OrderedDict([
+        ('service/application.properties', OrderedDict([('db.host', 'localhost'), ('db.port', '5432')])),
+        ('service/config.json', {'debug': False}),
+        ('service/settings.yml', {'cache': {'ttl': 30}}),
+    ])
+    out = str(tmpdir)
+    manager.write_properties(datastructure, out)
+    assert diff.diff(datastructure, out) == []
+
+    tmpdir.join('service', 'application.properties').write('db.host=remote\ndb.user=admin')
+    tmpdir.join('service', 'config.json').remove()
+    tmpdir.join('service', 'notes.txt').write('manual')
+
+    assert diff.diff(datastructure, out) == [
+        diff.FileDiff('service/application.properties', diff.CHANGED, [
+            ('~', ('db.host',), 'remote', 'localhost'),
+            ('+', ('db.port',), None, '5432'),
+            ('-', ('db.user',), 'admin', None),
+        ]),
+        diff.FileDiff('service/config.json', diff.MISSING, []),
+        diff.FileDiff('service/notes.txt', diff.EXTRA, []),
+    ]
+    assert len(diff.diff(datastructure, out, jobs=1, extra=False)) == 2
+
+
+def test_diff_in_processes_counts_parsed_files(tmpdir):
+    datastructure = OrderedDict(
+        ('service/config{}.json'.format(number), {'number': number}) for number in range(4)
+    )
+    out = str(tmpdir)
+    manager.write_properties(datastructure, out)
+    tmpdir.join('service', 'config1.json').write('{"number": 10}')
+
+    result = profiler.profile(None, diff.diff, datastructure, out, 4)
+
+    assert result.counters[('files_parsed', '.json')] == 1
@@ -0,0 +1,75 @@
+from collections import OrderedDict
+from xml.dom.minidom import parseString
+
+import pytest
+import xmltodict
+
+from shaper import manager
+from shaper.libs import dicttoxml, lxml_backend
+from shaper.libs.parser import XMLParser
+
+pytest.importorskip('lxml')
+
+DOCUMENT = u"""<?xml version="1.0" encoding="utf-8"?>
+<soap:Envelope xmlns:soap="http://schemas.xmlsoap.org/soap/envelope/">
+  <soap:Body>
+    <return>
+      <brand>Unknown Brand</brand>
+      <name highlighted="Logic">The Logic is cool &amp; powerful</name>
+      <locales target="option">
+        <locale name="ru_RU"><![CDATA[test]]></locale>
+        <!-- comment -->
+        <locale name="en_US"><![CDATA[test2]]></locale>
+      </locales>
+      <empty/>
+    </return>
+  </soap:Body>
+</soap:Envelope>
+"""
+
+
+def test_parse_equals_xmltodict(tmpdir):
+    path = tmpdir.join('test.xml')
+    path.write_text(DOCUMENT, encoding='utf-8')
+
+    assert lxml_backend.parse(str(path)) == xmltodict.parse(DOCUMENT)
+
+
+def test_xml_parser_uses_backend_and_commands_keep_text(tmpdir, monkeypatch):
+    path = tmpdir.join('test.xml')
+    path.write_text(DOCUMENT, encoding='utf-8')
+    parsed = []
+    parse = lxml_backend.parse
+
+    def recording_parse(source):
+        parsed.append(source)
+        return parse(source)
+
+    monkeypatch.setattr(lxml_backend, 'parse', recording_parse)
+
+    assert XMLParser().read(str(path)) == xmltodict.parse(DOCUMENT)
+    assert manager.read_properties(str(tmpdir)) == {str(path): DOCUMENT}
+    assert parsed == [str(path)]
+
+
+def test_dict_to_xml_equals_dicttoxml():
+    data = OrderedDict([
+        ('root', OrderedDict([
+            ('item', [1, OrderedDict([('empty', None)]), [2, 3]]),
+            ('with space', 'value'),
+            ('42', 'numeric'),
+        ])),
+    ])
+
+    expected = parseString(
+        dicttoxml.dict_to_xml(
+            data,
+            fold_list=False,
+            item_func=lambda x: x,
+            attr_type=False,
+            root=False,
+        ),
+    )
+    output = parseString(lxml_backend.dict_to_xml(data))
+
+    assert xmltodict.parse(output.toxml()) == xmltodict.parse(expected.toxml())
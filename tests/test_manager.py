@@ -75,3 +75,37 @@ def test_backward_path_parser():
 
     assert expected == manager.backward_path_parser(datastructure)
 
+
+def test_select_paths():
+    tree = OrderedDict([
+        ('my-backend', OrderedDict([
+            ('src', OrderedDict([
+                ('application-prod1.properties', {'a': '1'}),
+                ('application-dev1.properties', {'a': '2'}),
+                ('nested', OrderedDict([('application-prod2.properties', {'a': '3'})])),
+            ])),
+        ])),
+        ('my-frontend', OrderedDict([
+            ('config.json', {'b': '4'}),
+        ])),
+    ])
+    flat = manager.backward_path_parser(tree)
+
+    def select(*keys):
+        return list(manager.select_paths(tree, keys))
+
+    assert select('my-backend/**/application-prod*') == [
+        'my-backend/src/application-prod1.properties',
+        'my-backend/src/nested/application-prod2.properties',
+    ]
+    assert select('my-backend/src/*.properties') == [
+        'my-backend/src/application-prod1.properties',
+        'my-backend/src/application-dev1.properties',
+    ]
+    assert select('my-backend/src/nested', 'my-frontend') == [
+        'my-backend/src/nested/application-prod2.properties',
+        'my-frontend/config.json',
+    ]
+    # key without glob characters keeps substring matching of flattened paths
+    for key in ('prod', 'end', 'config.json', 'missing', 'backend/src', 'c/nested/app', 'end/con', 'src/'):
+        assert select(key) == [path for path in flat if key in path]
@@ -0,0 +1,36 @@
+import jinja2
+
+from shaper import playbook, renderer
+
+
+def test_compile_and_load_bundle(tmpdir, monkeypatch):
+    tmpdir.join('playbook.yml').write(
+        'variables:\n'
+        '  host: localhost\n'
+        'templates:\n'
+        '  - service.j2\n'
+        '  - nested/database.j2\n',
+    )
+    tmpdir.join('service.j2').write('service:\n  host: {{ host }}\n')
+    tmpdir.mkdir('nested').join('database.j2').write('database:\n  {% include "port.j2" %}\n')
+    tmpdir.join('nested', 'port.j2').write('port: 5432\n')
+    bundle_path = str(tmpdir.join('bundle.zip'))
+
+    playbook.compile_playbook(str(tmpdir.join('playbook.yml')), bundle_path)
+
+    def forbidden_compile(*args, **kwargs):
+        raise AssertionError('template compiled at runtime')
+
+    monkeypatch.setattr(jinja2.Environment, 'compile', forbidden_compile)
+    data, template_dir, loader_factory = playbook.load_playbook(bundle_path)
+    loaded = renderer.render_templates(
+        data['templates'],
+        data['variables'],
+        loader_factory=loader_factory,
+    )
+
+    assert template_dir == ''
+    assert loaded == [
+        {'service': {'host': 'localhost'}},
+        {'database': {'port': 5432}},
+    ]
@@ -0,0 +1,81 @@
+import json
+
+import pytest
+
+from shaper import cli, profiler
+
+try:
+    from StringIO import StringIO
+except ImportError:
+    from io import StringIO
+
+
+def test_phase_is_noop_without_profiler():
+    assert profiler.phase('read .yml') is profiler.NULL_PHASE
+
+
+def test_profile_read_phases(test_assets_root, tmpdir):
+    stats_path = str(tmpdir.join('read.pstats'))
+    arguments = cli.construct_parser().parse_args(
+        ['read', str(test_assets_root / 'input'), '-o', str(tmpdir.join('out.yml'))],
+    )
+
+    result = profiler.profile(stats_path, cli.read, arguments)
+
+    assert list(result.phases)[0] == 'walk_on_path'
+    assert {'read .properties', 'forward_path_parser', 'write .yml'} <= set(result.phases)
+    assert tmpdir.join('read.pstats').size() > 0
+    assert profiler.ACTIVE is None
+
+    report = StringIO()
+    result.report(report)
+    assert report.getvalue().splitlines()[-1].startswith('total')
+
+
+def test_metrics_counters(tmpdir):
+    dsl = tmpdir.join('dsl.yml')
+    dsl.write(
+        'service:\n'
+        '  application.properties:\n'
+        '    db.host: localhost\n'
+        "    db.port: '5432'\n",
+    )
+    arguments = cli.construct_parser().parse_args(
+        ['--metrics', str(tmpdir.join('metrics.prom')), '--metrics-format', 'prometheus',
+         'write', str(dsl), '-o', str(tmpdir.join('out'))],
+    )
+
+    result = profiler.profile(None, cli.write, arguments)
+    metrics = result.metrics('write')
+
+    assert metrics['counters']['files_parsed'] == {'.yml': 1}
+    assert metrics['counters']['bytes_read'] == {'.yml': dsl.size()}
+    assert metrics['counters']['keys_written'] == {'.properties': 2}
+    assert metrics['counters']['files_written'] == {'.properties': 1}
+    assert metrics['phases']['read .yml']['calls'] == 1
+
+    cli.run(cli.construct_parser(), arguments)
+    lines = tmpdir.join('metrics.prom').read().splitlines()
+    assert 'shaper_files_written_total{command="write",ext=".properties"} 1' in lines
+    # second run reads DSL from snapshot
+    assert 'shaper_snapshots_read_total{command="write",ext=".yml"} 1' in lines
+    assert 'shaper_run_exit_status{command="write"} 0' in lines
+
+
+def test_profile_reported_on_exit(tmpdir, capsys):
+    dsl = tmpdir.join('dsl.yml')
+    dsl.write('service:\n  config.json:\n    debug: false\n')
+    out = tmpdir.join('out')
+    cli.run(cli.construct_parser(), cli.construct_parser().parse_args(['write', str(dsl), '-o', str(out)]))
+    out.join('service', 'config.json').write('{"debug": true}')
+
+    parser = cli.construct_parser()
+    arguments = parser.parse_args(
+        ['--profile', '--metrics', str(tmpdir.join('metrics.json')), 'diff', str(dsl), str(out)],
+    )
+    with pytest.raises(SystemExit) as exc_info:
+        cli.run(parser, arguments)
+
+    assert exc_info.value.code == 1
+    assert capsys.readouterr().err.splitlines()[-1].startswith('total')
+    assert json.loads(tmpdir.join('metrics.json').read())['exit_status'] == 1
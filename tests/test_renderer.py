@@ -0,0 +1,199 @@
+import os
+import stat
+
+import jinja2
+import pytest
+import yaml
+
+from shaper import renderer
+
+
+def create_templates(tmpdir):
+    tmpdir.join('common.j2').write('port: {{ port }}\n')
+    tmpdir.join('first.j2').write('first:\n  host: {{ host }}\n')
+    tmpdir.join('second.j2').write('second:\n  {% include "common.j2" %}\n')
+
+
+def test_renderer_shares_environment(tmpdir):
+    create_templates(tmpdir)
+    context = {'host': 'localhost', 'port': 8080}
+    template_renderer = renderer.TemplateRenderer(context)
+
+    first = template_renderer.render(str(tmpdir.join('first.j2')))
+    second = template_renderer.render(str(tmpdir.join('second.j2')))
+
+    assert first == 'first:\n  host: localhost'
+    assert second == 'second:\n  port: 8080'
+    assert list(template_renderer.environments) == [str(tmpdir)]
+
+
+def test_renderer_bytecode_cache(tmpdir):
+    create_templates(tmpdir)
+    cache_dir = tmpdir.join('cache')
+    bytecode_cache = renderer.create_bytecode_cache(str(cache_dir))
+    template_renderer = renderer.TemplateRenderer({}, bytecode_cache)
+
+    template_renderer.render(str(tmpdir.join('second.j2')))
+
+    assert len(os.listdir(str(cache_dir))) == 2
+
+
+def test_render_templates_in_parallel(tmpdir):
+    create_templates(tmpdir)
+    context = {'host': 'localhost', 'port': 8080}
+    paths = [str(tmpdir.join(name)) for name in ('second.j2', 'first.j2', 'common.j2')]
+
+    expected = renderer.render_templates(paths, context, jobs=1)
+
+    assert expected == [
+        {'second': {'port': 8080}},
+        {'first': {'host': 'localhost'}},
+        {'port': 8080},
+    ]
+    assert renderer.render_templates(paths, context, jobs=3) == expected
+
+
+def test_merge_templates_accepts_rendered_text(tmpdir):
+    renderer.merge_templates(['first:\n  host: localhost', {'second': {'port': 8080}}], str(tmpdir))
+
+    assert yaml.safe_load(tmpdir.join('templates.yaml').read()) == {
+        'first': {'host': 'localhost'},
+        'second': {'port': 8080},
+    }
+
+
+def test_deep_merger_shares_untouched_subtrees():
+    base = {
+        'service': {
+            'db': {'host': 'localhost', 'port': 5432},
+            'cache': {'host': 'localhost'},
+        },
+    }
+    overlay = {'service': {'db': {'host': 'db.prod'}, 'debug': False}}
+
+    merger = renderer.DeepMerger()
+    merger.merge(base, 'base.j2')
+    merger.merge(overlay, 'prod.j2')
+
+    assert merger.result == {
+        'service': {
+            'db': {'host': 'db.prod', 'port': 5432},
+            'cache': {'host': 'localhost'},
+            'debug': False,
+        },
+    }
+    assert merger.result['service']['cache'] is base['service']['cache']
+    assert base['service']['db']['host'] == 'localhost'
+    assert merger.conflicts == [
+        renderer.MergeConflict(('service', 'db', 'host'), 'localhost', 'db.prod', 'prod.j2'),
+    ]
+
+
+def test_stream_matrix_writes_output(tmpdir):
+    tmpdir.join('services.j2').write(
+        '{% for name in names %}\n{{ name }}: {port: {{ port }}, hosts: [{{ host }}]}\n{% endfor %}\n',
+    )
+    path = str(tmpdir.join('services.j2'))
+    contexts = {
+        'dev': {'names': ['api', 'db'], 'host': 'dev.local', 'port': 1},
+        'prod': {'names': ['api'], 'host': 'prod.local', 'port': 2},
+    }
+    out_dirs = {name: str(tmpdir.join('out', name)) for name in contexts}
+
+    for jobs in (1, 2):
+        written = renderer.stream_matrix(path, out_dirs, contexts, jobs=jobs)
+
+        for name, loaded in renderer.render_matrix([path], contexts).items():
+            assert yaml.safe_load(tmpdir.join('out', name, 'templates.yaml').read()) == loaded[0]
+            assert written[name] == str(tmpdir.join('out', name, 'templates.yaml'))
+        assert tmpdir.join('out', 'dev', 'templates.yaml').read().startswith('api:\n  port: 1\n')
+
+    for template in ('- api\n', 'api: 1\n---\ndb: 2\n', 'api: !!python/name:os.system\n'):
+        tmpdir.join('services.j2').write(template)
+        with pytest.raises(ValueError):
+            renderer.stream_matrix(path, out_dirs, contexts)
+    assert tmpdir.join('out', 'dev').listdir() == [tmpdir.join('out', 'dev', 'templates.yaml')]
+
+
+def test_render_cache_tracks_dependencies(tmpdir):
+    create_templates(tmpdir)
+    context = {'host': 'localhost', 'port': 8080}
+    first, second = str(tmpdir.join('first.j2')), str(tmpdir.join('second.j2'))
+    cache_path = str(tmpdir.join('cache.json'))
+
+    render_cache = renderer.RenderCache(cache_path)
+    renderer.render_templates([first, second], context, render_cache=render_cache)
+    render_cache.save()
+
+    render_cache = renderer.RenderCache(cache_path)
+    assert render_cache.get(first, context) == 'first:\n  host: localhost'
+    assert render_cache.get(second, dict(context, host='remote')) == 'second:\n  port: 8080'
+    assert render_cache.get(second, dict(context, port=8081)) is None
+
+    tmpdir.join('common.j2').write('port: 0\n')
+    assert render_cache.get(first, context) is not None
+    assert render_cache.get(second, context) is None
+
+
+@pytest.mark.skipif(not hasattr(os, 'getuid'), reason='POSIX permissions')
+def test_render_cache_is_private(tmpdir, monkeypatch):
+    monkeypatch.setattr(renderer.tempfile, 'tempdir', str(tmpdir))
+    cache_dir = tmpdir.join('shaper-cache-{}'.format(os.getuid()))
+
+    render_cache = renderer.RenderCache.for_playbook('playbook.yml')
+    render_cache.save()
+
+    assert stat.S_IMODE(cache_dir.stat().mode) == 0o700
+    assert os.path.dirname(render_cache.path) == str(cache_dir)
+    assert stat.S_IMODE(os.stat(render_cache.path).st_mode) == 0o600
+    assert [path.strpath for path in cache_dir.listdir()] == [render_cache.path]
+
+    # directory planted by somebody else is not used
+    cache_dir.remove()
+    tmpdir.join('elsewhere').mkdir().chmod(0o700)
+    cache_dir.mksymlinkto(tmpdir.join('elsewhere'))
+    with pytest.raises(RuntimeError):
+        renderer.RenderCache.for_playbook('playbook.yml')
+
+
+def test_render_matrix_compiles_once(tmpdir, monkeypatch):
+    create_templates(tmpdir)
+    paths = [str(tmpdir.join('first.j2')), str(tmpdir.join('second.j2'))]
+    contexts = {
+        'dev': {'host': 'dev.local', 'port': 1},
+        'prod': {'host': 'prod.local', 'port': 2},
+    }
+    compiled = []
+    compile_template = jinja2.Environment.compile
+
+    def counting_compile(self, source, name=None, *args, **kwargs):
+        compiled.append(name)
+        return compile_template(self, source, name, *args, **kwargs)
+
+    monkeypatch.setattr(jinja2.Environment, 'compile', counting_compile)
+    loaded = renderer.render_matrix(paths, contexts, cache_dir=str(tmpdir.join('cache')))
+
+    assert loaded == {
+        'dev': [{'first': {'host': 'dev.local'}}, {'second': {'port': 1}}],
+        'prod': [{'first': {'host': 'prod.local'}}, {'second': {'port': 2}}],
+    }
+    assert sorted(compiled) == ['common.j2', 'first.j2', 'second.j2']
+
+
+def test_generator_reader_feeds_yaml_loader():
+    chunks = ['services:\n', '  - name: a', 'pi\n', '    port: 80', '80\n']
+
+    reader = renderer.GeneratorReader(chunks)
+
+    assert reader.read(3) == 'ser'
+    assert yaml.safe_load(reader) == {'vices': [{'name': 'api', 'port': 8080}]}
+
+
+def test_render_templates_streamed(tmpdir):
+    create_templates(tmpdir)
+    context = {'host': 'localhost', 'port': 8080}
+    paths = [str(tmpdir.join(name)) for name in ('first.j2', 'second.j2')]
+
+    streamed = renderer.render_templates(paths, context, stream=True)
+
+    assert streamed == renderer.render_templates(paths, context)
@@ -0,0 +1,117 @@
+import os
+import socket
+import stat
+import sys
+import threading
+
+import jinja2
+import pytest
+
+from shaper import client, libs, server
+
+
+@pytest.fixture
+def shaper_server(tmpdir):
+    instance = server.ShaperServer(str(tmpdir.join('shaper.sock')))
+    thread = threading.Thread(target=instance.serve_forever)
+    thread.start()
+    yield instance
+    instance.shutdown()
+    thread.join()
+    instance.server_close()
+
+
+def test_write_parses_dsl_once(tmpdir, shaper_server, monkeypatch):
+    tmpdir.join('dsl.yml').write('service:\n  application.properties:\n    db.host: localhost\n')
+    parsed = []
+    read = libs.parser.read
+
+    def counting_read(path):
+        parsed.append(path)
+        return read(path)
+
+    monkeypatch.setattr(libs.parser, 'read', counting_read)
+
+    for _ in range(2):
+        response = client.request(['write', 'dsl.yml', '-o', 'out'], shaper_server.socket_path, str(tmpdir))
+        assert response['status'] == 0, response['stderr']
+
+    assert tmpdir.join('out', 'service', 'application.properties').read() == 'db.host=localhost'
+    assert len(parsed) == 1
+
+
+def test_play_compiles_templates_once(tmpdir, shaper_server, monkeypatch):
+    tmpdir.join('playbook.yml').write('variables:\n  host: localhost\ntemplates:\n  - service.j2\n')
+    tmpdir.join('service.j2').write('service:\n  host: {{ host }}\n')
+    compiled = []
+    compile_ = jinja2.Environment.compile
+
+    def counting_compile(self, *args, **kwargs):
+        compiled.append(args)
+        return compile_(self, *args, **kwargs)
+
+    monkeypatch.setattr(jinja2.Environment, 'compile', counting_compile)
+
+    for _ in range(2):
+        response = client.request(['play', 'playbook.yml'], shaper_server.socket_path, str(tmpdir))
+        assert response['status'] == 0, response['stderr']
+
+    assert libs.parser.read(str(tmpdir.join('out', 'templates.yaml'))) == {'service': {'host': 'localhost'}}
+    assert len(compiled) == 1
+
+
+def test_failed_command_reports_status(tmpdir, shaper_server):
+    response = client.request(['write'], shaper_server.socket_path, str(tmpdir))
+
+    assert response['status'] == 2
+    assert 'src_structure' in response['stderr']
+
+
+def test_socket_is_private_from_bind(tmpdir, monkeypatch):
+    # permissions come from umask at bind, not from chmod after it
+    monkeypatch.setattr(server.os, 'chmod', lambda path, mode: None)
+    instance = server.ShaperServer(str(tmpdir.join('private.sock')))
+    try:
+        assert stat.S_IMODE(os.stat(instance.socket_path).st_mode) & 0o077 == 0
+    finally:
+        instance.server_close()
+
+
+def test_client_falls_back_only_without_server(tmpdir, monkeypatch):
+    with pytest.raises(client.ServerUnavailable):
+        client.request(['write'], str(tmpdir.join('missing.sock')), str(tmpdir))
+
+    def broken_request(argv):
+        raise socket.error('connection reset by peer')
+
+    monkeypatch.setattr(client, 'request', broken_request)
+    monkeypatch.setattr(sys, 'argv', ['shaper-client', 'write', 'dsl.yml'])
+    with pytest.raises(SystemExit) as exc_info:
+        client.main()
+
+    assert exc_info.value.code == 2
+
+
+def test_client_trusts_only_private_socket_of_user(tmpdir, shaper_server):
+    client.check_socket(shaper_server.socket_path)
+
+    os.chmod(shaper_server.socket_path, 0o666)
+    with pytest.raises(client.UntrustedSocket):
+        client.request(['write'], shaper_server.socket_path, str(tmpdir))
+
+    tmpdir.join('file.sock').write('')
+    with pytest.raises(client.UntrustedSocket):
+        client.check_socket(str(tmpdir.join('file.sock')))
+
+
+def test_warm_cache_drops_least_recently_read_files(tmpdir):
+    cache = server.WarmCache(max_files=2)
+    for name in ('first', 'second', 'third'):
+        tmpdir.join(name + '.yml').write('{}: 1\n'.format(name))
+
+    cache.read(str(tmpdir.join('first.yml')))
+    cache.read(str(tmpdir.join('second.yml')))
+    cache.read(str(tmpdir.join('first.yml')))
+    cache.read(str(tmpdir.join('third.yml')))
+
+    assert list(cache.files) == [str(tmpdir.join('first.yml')), str(tmpdir.join('third.yml'))]
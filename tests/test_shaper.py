@@ -1,7 +1,7 @@
 import os
 import shutil
 
-from shaper import manager, libs
+from shaper import cli, manager, libs
 
 
 def test_read(test_assets_root):
@@ -50,5 +50,87 @@ def test_write(test_assets_root):
     shutil.rmtree(output_dir)
 
 
-def test_play():
-    pass
+def test_write_keys_without_matches_warn(tmpdir):
+    dsl = str(tmpdir.join('out.yml'))
+    libs.parser.write({'project': {'backend': {'app.yml': {'a': 'b'}}}}, dsl)
+
+    def write(key, *options):
+        return cli.run_captured(['write', dsl, '-k', key, '-o', str(tmpdir.join('out'))] + list(options))
+
+    assert write('project/backend') == {'status': 0, 'stdout': '', 'stderr': ''}
+    response = write('project/frontend')
+    assert response['status'] == 0
+    assert 'No files match keys: project/frontend' in response['stderr']
+    assert write('project/frontend', '--strict-keys')['status'] == 1
+
+
+def test_play(tmpdir):
+    tmpdir.join('playbook.yml').write(
+        'variables:\n'
+        '  host: localhost\n'
+        'templates:\n'
+        '  - service.j2\n',
+    )
+    tmpdir.join('service.j2').write(
+        'service:\n'
+        '  application.properties:\n'
+        '    db.host: {{ host }}\n',
+    )
+    output_dir = tmpdir.join('out')
+
+    arguments = cli.construct_parser().parse_args(
+        ['play', str(tmpdir.join('playbook.yml')), '-o', str(output_dir), '--write'],
+    )
+    cli.play(arguments)
+
+    output_data = libs.parser.read(str(output_dir.join('service', 'application.properties')))
+    assert output_data == {'db.host': 'localhost'}
+
+
+def test_write_watch_rewrites_changed_files(tmpdir, monkeypatch):
+    dsl = tmpdir.join('dsl.yml')
+    dsl.write(
+        'service:\n'
+        '  first.properties:\n'
+        '    db.host: localhost\n'
+        '  second.properties:\n'
+        '    db.port: 5432\n',
+    )
+    output_dir = tmpdir.join('out')
+    written = []
+
+    def edits(path, interval):
+        dsl.write(dsl.read().replace('localhost', 'db.example.com'))
+        yield
+
+    def recording_write(datastructure, path):
+        written.append(sorted(datastructure))
+
+    monkeypatch.setattr(manager, 'watch', edits)
+    monkeypatch.setattr(manager, 'write_properties', recording_write)
+
+    arguments = cli.construct_parser().parse_args(
+        ['write', str(dsl), '-o', str(output_dir), '--watch'],
+    )
+    cli.write(arguments)
+
+    assert written == [
+        ['service/first.properties', 'service/second.properties'],
+        ['service/first.properties'],
+    ]
+
+
+def test_sharded_read_merges_into_single_read(test_assets_root, tmpdir):
+    input_dir = str(test_assets_root / 'input')
+    parser = cli.construct_parser()
+
+    cli.read(parser.parse_args(['read', input_dir, '-o', str(tmpdir.join('full.yml'))]))
+    parts = []
+    for index in range(3):
+        parts.append(str(tmpdir.join('part{}.yml'.format(index))))
+        cli.read(parser.parse_args(['read', input_dir, '--shard', '{}/3'.format(index), '-o', parts[-1]]))
+    cli.merge_shards(parser.parse_args(['merge'] + parts + ['-o', str(tmpdir.join('merged.yml'))]))
+
+    assert tmpdir.join('merged.yml').read() == tmpdir.join('full.yml').read()
+    shards = [manager.backward_path_parser(libs.parser.read(part) or {}) for part in parts]
+    assert sum(len(shard) for shard in shards) == len(manager.read_properties(input_dir))
@@ -0,0 +1,53 @@
+import datetime
+import os
+
+from shaper import cli, libs, manager, snapshot
+
+
+def test_snapshot_roundtrip_and_invalidation(tmpdir, monkeypatch):
+    shared = {'db.host': 'localhost', 'db.port': 5432}
+    tree = {
+        'project': {
+            'backend': {'application.properties': shared, 'config.json': {'ratio': 0.5, 'debug': False}},
+            'frontend': {'application.yml': {'db': shared, 'hosts': ['a', 'b', None]}},
+        },
+    }
+    dsl = str(tmpdir.join('out.yml'))
+    libs.parser.write(tree, dsl)
+
+    assert snapshot.read(dsl) == tree
+    assert os.path.isfile(snapshot.snapshot_path(dsl))
+
+    def failing_read(path):
+        raise AssertionError('DSL parsed again')
+
+    monkeypatch.setattr(libs.parser, 'read', failing_read)
+    cached = snapshot.read(dsl)
+    assert isinstance(cached, snapshot.SnapshotMapping)
+    assert manager.backward_path_parser(cached) == manager.backward_path_parser(tree)
+    assert manager.select_paths(cached, ['project/frontend']) == {
+        'project/frontend/application.yml': tree['project']['frontend']['application.yml'],
+    }
+
+    monkeypatch.undo()
+    tree['project']['backend']['config.json']['debug'] = True
+    libs.parser.write(tree, dsl)
+    assert snapshot.read(dsl) == tree
+
+
+def test_unsupported_values_are_not_snapshotted(tmpdir):
+    dsl = str(tmpdir.join('out.yml'))
+    with open(dsl, 'w') as _fd:
+        _fd.write('project:\n  app.yml:\n    released: 2020-01-01\n')
+
+    assert snapshot.read(dsl) == {'project': {'app.yml': {'released': datetime.date(2020, 1, 1)}}}
+    assert not os.path.exists(snapshot.snapshot_path(dsl))
+
+
+def test_write_without_snapshot(tmpdir):
+    dsl = str(tmpdir.join('out.yml'))
+    libs.parser.write({'project': {'app.yml': {'a': 'b'}}}, dsl)
+    arguments = cli.construct_parser().parse_args(['write', dsl, '--no-snapshot', '-o', str(tmpdir.join('out'))])
+
+    assert cli.load_datastructure(arguments) == {'project/app.yml': {'a': 'b'}}
+    assert not os.path.exists(snapshot.snapshot_path(dsl))
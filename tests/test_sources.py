@@ -0,0 +1,130 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+
+import pytest
+
+from shaper import cli, libs, renderer, sources
+
+
+class CountingSource(sources.StaticSource):
+
+    def __init__(self, *args, **kwargs):
+        super(CountingSource, self).__init__(*args, **kwargs)
+        self.requests = []
+
+    def fetch(self, connection, keys):
+        self.requests.append(sorted(keys))
+        return super(CountingSource, self).fetch(connection, keys)
+
+
+def test_lookups_are_batched_and_memoized(tmpdir):
+    tmpdir.join('first.j2').write(
+        "first: {{ lookup('cmdb', 'redis.host') }}:{{ lookup('cmdb', 'redis.port') }}\n",
+    )
+    tmpdir.join('second.j2').write(
+        "second: {{ lookup('cmdb', 'redis.' ~ name) }}{{ lookup('cmdb', 'missing', 'n/a') }}\n",
+    )
+    source = CountingSource(values={'redis.host': 'cache', 'redis.port': 6379}, batch_size=10)
+    variable_sources = sources.VariableSources({'cmdb': source})
+    paths = [str(tmpdir.join('first.j2')), str(tmpdir.join('second.j2'))]
+
+    variable_sources.prefetch(paths, renderer.FileSystemLoader)
+    loaded = renderer.render_templates(
+        paths,
+        {'name': 'host', sources.LOOKUP: variable_sources},
+    )
+
+    assert loaded == [{'first': 'cache:6379'}, {'second': 'cachen/a'}]
+    assert source.requests == [['missing', 'redis.host', 'redis.port']]
+
+
+def test_batches_are_fetched_concurrently():
+    active, peak = [], []
+    lock = threading.Lock()
+
+    class SlowSource(sources.StaticSource):
+
+        def fetch(self, connection, keys):
+            with lock:
+                active.append(keys)
+                peak.append(len(active))
+            time.sleep(0.05)
+            with lock:
+                active.remove(keys)
+            if keys == ['broken']:
+                raise IOError('source is down')
+            return super(SlowSource, self).fetch(connection, keys)
+
+    values = {'key-{}'.format(number): number for number in range(6)}
+    source = SlowSource(values=values, pool_size=3, batch_size=1)
+
+    assert source.get_many(sorted(values)) == values
+    assert max(peak) == 3
+    assert source.pool.created == 3
+
+    with pytest.raises(IOError):
+        source.get_many(['key-0', 'broken'])
+    with pytest.raises(TypeError):
+        sources.BaseSource()
+
+
+def test_sqlite_source(tmpdir):
+    path = str(tmpdir.join('cmdb.db'))
+    connection = sqlite3.connect(path)
+    connection.execute('CREATE TABLE variables (key TEXT PRIMARY KEY, value TEXT)')
+    connection.executemany(
+        'INSERT INTO variables VALUES (?, ?)',
+        [('key-{}'.format(number), str(number)) for number in range(5)] + [('name', 'cmdb')],
+    )
+    connection.commit()
+    connection.close()
+
+    variable_sources = sources.from_playbook(
+        {'sources': {'cmdb': {'type': 'sqlite', 'path': 'cmdb.db', 'batch_size': 2}}},
+        str(tmpdir),
+    )
+    variable_sources.fetch('cmdb', ['key-{}'.format(number) for number in range(5)])
+
+    assert variable_sources('cmdb', 'key-3') == 3
+    assert variable_sources('cmdb', 'name') == 'cmdb'
+    assert variable_sources('cmdb', 'unknown') is None
+
+
+def test_incremental_play_tracks_lookups(tmpdir):
+    tmpdir.join('playbook.yml').write(
+        'variables:\n'
+        '  name: a\n'
+        'sources:\n'
+        '  cmdb:\n'
+        '    path: vals.yml\n'
+        'templates:\n'
+        '  - dynamic.j2\n'
+        '  - constant.j2\n',
+    )
+    tmpdir.join('dynamic.j2').write("dynamic.yml:\n  a: {{ lookup('cmdb', 'key.' ~ name) }}\n")
+    tmpdir.join('constant.j2').write("constant.yml:\n  b: {{ lookup('cmdb', 'key.b') }}\n")
+
+    for jobs in ('1', '2'):
+        cache_dir = tmpdir.join('cache-' + jobs)
+        out = tmpdir.join('out-' + jobs)
+        for value in ('one', 'two'):
+            tmpdir.join('vals.yml').write('key.a: {value}\nkey.b: {value}\n'.format(value=value))
+            cli.play(cli.construct_parser().parse_args([
+                'play', str(tmpdir.join('playbook.yml')), '-o', str(out), '--write',
+                '-i', '--cache-dir', str(cache_dir), '-j', jobs,
+            ]))
+
+            assert libs.parser.read(str(out.join('dynamic.yml'))) == {'a': value}
+            assert libs.parser.read(str(out.join('constant.yml'))) == {'b': value}
+
+        # template with lookup key built at render time is not cached
+        cache_path = [path for path in cache_dir.listdir() if path.basename.startswith('shaper-play-')][0]
+        assert [os.path.basename(path) for path in json.loads(cache_path.read())] == ['constant.j2']
+
+
+def test_unknown_source_type(tmpdir):
+    with pytest.raises(ValueError, match="Unknown type 'redis' of variable source 'cmdb'"):
+        sources.from_playbook({'sources': {'cmdb': {'type': 'redis'}}}, str(tmpdir))
@@ -0,0 +1,34 @@
+from shaper import cli, libs, manager, split
+
+
+def test_split_roundtrip_loads_selected_shards(tmpdir, monkeypatch):
+    tree = {
+        'project': {
+            'backend': {'application.properties': {'db.host': 'localhost'}},
+            'frontend': {'config.json': {'debug': False}},
+        },
+    }
+    shard_dir = str(tmpdir.join('split'))
+
+    index = split.write_split(tree, shard_dir)
+
+    assert index['prefix'] == ['project']
+    assert dict(index['shards']) == {'backend': 'backend.yml', 'frontend': 'frontend.yml'}
+    assert split.load_split(shard_dir, jobs=2) == tree
+
+    loaded = []
+    read = libs.parser.read
+
+    def recording_read(path):
+        loaded.append(path)
+        return read(path)
+
+    monkeypatch.setattr(libs.parser, 'read', recording_read)
+    arguments = cli.construct_parser().parse_args(
+        ['write', shard_dir, '-k', 'project/backend/**', '-o', str(tmpdir.join('out'))],
+    )
+
+    assert cli.load_datastructure(arguments) == manager.backward_path_parser(
+        {'project': {'backend': tree['project']['backend']}},
+    )
+    assert [path for path in loaded if 'frontend' in path] == []
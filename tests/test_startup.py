@@ -0,0 +1,55 @@
+import subprocess
+import sys
+
+
+def test_import_runs_no_subprocess():
+    statement = (
+        'import subprocess\n'
+        'def forbidden(*args, **kwargs):\n'
+        '    raise AssertionError("subprocess started on import")\n'
+        'subprocess.Popen = forbidden\n'
+        'import shaper\n'
+        'from shaper import cli\n'
+    )
+
+    subprocess.check_call([sys.executable, '-c', statement])
+
+
+# heavy modules commands import only when they need them
+HEAVY_MODULES = {'jinja2', 'yaml', 'xmltodict', 'lxml', 'sqlite3', 'multiprocessing'}
+
+
+def loaded_modules(argv, tmpdir):
+    """Run CLI in fresh interpreter.
+
+    :return: names of top level packages imported by the run
+    """
+    modules_path = str(tmpdir.join('modules.txt'))
+    statement = (
+        'import sys\n'
+        'sys.argv = {argv!r}\n'
+        'from shaper.cli import main\n'
+        'try:\n'
+        '    main()\n'
+        'except SystemExit:\n'
+        '    pass\n'
+        'with open({path!r}, "w") as _fd:\n'
+        '    _fd.write("\\n".join(sys.modules))\n'
+    ).format(argv=['shaper'] + argv, path=modules_path)
+    subprocess.check_call([sys.executable, '-c', statement], stdout=subprocess.PIPE)
+
+    with open(modules_path) as _fd:
+        return {name.split('.')[0] for name in _fd.read().splitlines()}
+
+
+def test_read_help_imports_no_heavy_modules(tmpdir):
+    assert not HEAVY_MODULES & loaded_modules(['read', '--help'], tmpdir)
+
+
+def test_write_imports_only_yaml(tmpdir):
+    dsl = tmpdir.join('dsl.yml')
+    dsl.write('service:\n  application.properties:\n    db.host: localhost\n')
+
+    modules = loaded_modules(['write', str(dsl), '-o', str(tmpdir.join('out'))], tmpdir)
+
+    assert HEAVY_MODULES & modules == {'yaml'}
@@ -0,0 +1,61 @@
+import os
+
+from shaper import cli, libs, manager, store
+
+
+def read_store(argv, src, db):
+    parser = cli.construct_parser()
+    cli.run(parser, parser.parse_args(['read', src, '--store', db] + argv))
+
+
+def test_store_update_load_and_query(tmpdir):
+    src = str(tmpdir.join('project'))
+    backend = os.path.join(src, 'backend')
+    frontend = os.path.join(src, 'frontend')
+    manager.create_folders(backend)
+    manager.create_folders(frontend)
+    libs.parser.write({'spring': {'redis': {'host': 'redis-1', 'port': 6379}}}, os.path.join(backend, 'a.yml'))
+    libs.parser.write({'spring.redis.host': 'redis-1'}, os.path.join(frontend, 'a.properties'))
+    db = str(tmpdir.join('config.db'))
+
+    read_store([], src, db)
+    connection = store.connect(db)
+    try:
+        assert store.load(connection) == manager.backward_path_parser(
+            manager.forward_path_parser(manager.read_properties(src)),
+        )
+        assert list(store.load(connection, ['**/backend'])) == [os.path.join(backend, 'a.yml').lstrip('/')]
+        assert [path for path, _, _ in store.query(connection, 'spring.redis.host', 'redis-1')] == [
+            os.path.join(backend, 'a.yml'), os.path.join(frontend, 'a.properties'),
+        ]
+        assert store.query(connection, 'spring.redis.p*', '6379') == [
+            (os.path.join(backend, 'a.yml'), 'spring.redis.port', '6379'),
+        ]
+
+        # only changed files are parsed, removed files are dropped
+        libs.parser.write({'spring': {'redis': {'host': 'redis-2'}}}, os.path.join(backend, 'a.yml'))
+        os.remove(os.path.join(frontend, 'a.properties'))
+        assert store.update(connection, src) == (1, 1)
+        assert store.update(connection, src) == (0, 0)
+        assert store.query(connection, 'spring.redis.host') == [
+            (os.path.join(backend, 'a.yml'), 'spring.redis.host', '"redis-2"'),
+        ]
+    finally:
+        connection.close()
+
+
+def test_write_from_store(tmpdir):
+    src = str(tmpdir.join('project'))
+    manager.create_folders(src)
+    libs.parser.write({'b': {'c': [1, 2]}, 'a': 'x'}, os.path.join(src, 'config.json'))
+    libs.parser.write('plain text', os.path.join(src, 'notes.txt'))
+    db = str(tmpdir.join('config.db'))
+    read_store([], src, db)
+
+    out = str(tmpdir.join('out'))
+    parser = cli.construct_parser()
+    cli.run(parser, parser.parse_args(['write', db, '--store', '-o', out]))
+
+    for filename in ('config.json', 'notes.txt'):
+        with open(os.path.join(src, filename)) as expected, open(os.path.join(out, src.lstrip('/'), filename)) as actual:
+            assert actual.read() == expected.read()